@@ -6,8 +6,27 @@ if [ -d "build" ]; then
     rm -rf build
 fi
 mkdir build
-pip install -r requirements.txt -t build/ --platform manylinux2014_x86_64 --only-binary=:all:
+# Optional: precompile for the Lambda runtime (var.lambda_runtime). /var/task is
+# read-only, so bytecode that doesn't match the runtime is recompiled on every cold
+# start. Skipped with a warning when that interpreter isn't installed locally.
+LAMBDA_PYTHON=${LAMBDA_PYTHON:-python3.12}
+if "$LAMBDA_PYTHON" -c '' 2>/dev/null; then
+    PIP_COMPILE_FLAG=--no-compile  # compiled below for the runtime instead
+else
+    echo "Warning: $LAMBDA_PYTHON not available - packaging without precompiled bytecode" >&2
+    LAMBDA_PYTHON=
+    PIP_COMPILE_FLAG=
+fi
+pip install -r requirements.txt -t build/ --platform manylinux2014_x86_64 --only-binary=:all: $PIP_COMPILE_FLAG
 cp -r src build/
+# Tests and local bytecode don't belong in the package
+find build/src -name __pycache__ -prune -exec rm -rf {} +
+find build/src -name 'test_*.py' -delete
+if [ -n "$LAMBDA_PYTHON" ]; then
+    # unchecked-hash: deployed sources never change, so skip the per-import mtime check
+    "$LAMBDA_PYTHON" -m compileall -q -j 0 --invalidation-mode unchecked-hash build/ >/dev/null \
+        || echo "Warning: bytecode compilation with $LAMBDA_PYTHON failed - packaging sources only" >&2
+fi
 cd build/
 zip -r ../lambda-package.zip .
 cd ..
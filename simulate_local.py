@@ -1,6 +1,6 @@
 import argparse
 import sys
-from src.engine.models import DbScenarioRequest
+from src.engine.models import DbScenarioRequest, dump_json
 from src.engine.reasoning import run_simulation
 
 def main():
@@ -18,7 +18,7 @@ def main():
     try:
         request = DbScenarioRequest(db_identifier=args.db, scenario=args.scenario)
         response = run_simulation(request)
-        print(response.model_dump_json(indent=2))
+        print(dump_json(response))
     except ValueError as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
@@ -1,8 +1,18 @@
-import boto3
-from src.engine.models import DbConfig
-from botocore.exceptions import ClientError
-from botocore.config import Config
-FAKE_DATABASES = {
+import os
+import threading
+from types import MappingProxyType
+from functools import lru_cache
+from cachetools import TTLCache, cached
+from cachetools.keys import hashkey
+from src.engine.models import DbConfig, RDS_IDENTIFIER_RE
+
+# describe_db_instances is slow (~100-300ms) and throttled by AWS, so repeat lookups
+# within a process (batch runs, what-if baseline) are served from this cache
+_db_state_cache = TTLCache(maxsize=256, ttl=60)
+_db_state_lock = threading.Lock()
+
+# Read-only view: shared by every batch worker thread, so nothing may mutate it
+FAKE_DATABASES = MappingProxyType({
     "prod-orders-db-01": DbConfig(
         identifier="prod-orders-db-01",
         multi_az=False,
@@ -55,25 +65,48 @@ FAKE_DATABASES = {
         storage_encrypted=False,
         engine_version=None
     )
-}
+})
+FAKE_DATABASE_IDS: frozenset[str] = frozenset(FAKE_DATABASES)
 
-def get_fake_db_state(db_identifier: str) -> DbConfig:
-    if db_identifier not in FAKE_DATABASES:
-        raise ValueError(f"Database {db_identifier} not found")
-    return FAKE_DATABASES[db_identifier]
+# Lambda runs on its execution role; locally we go through the named CLI profile
+AWS_PROFILE = None if os.getenv('AWS_EXECUTION_ENV') is not None else 'develeap-ishay'
 
-def get_real_db_state(db_identifier: str, region: str='us-east-1', profile_name: str=None) -> DbConfig:
+# Client construction loads service models and sets up TLS, so build one per
+# (region, profile) and let concurrent batch workers share its connection pool.
+# describe_db_instances is rate limited; adaptive retries make the client
+# self-throttle instead of burning the read timeout on throttled calls.
+@lru_cache(maxsize=16)
+def _rds_client(region: str, profile_name: str | None):
+    # boto3 takes hundreds of ms to import; fake-DB runs never get here
+    import boto3
+    from botocore.config import Config
     config = Config(
         connect_timeout=5,
-        read_timeout=10   
+        read_timeout=10,
+        tcp_keepalive=True,
+        retries={'max_attempts': 10, 'mode': 'adaptive'}
     )
     if profile_name:
         session = boto3.Session(profile_name=profile_name)
-        rds = session.client('rds', region_name=region, config=config)
+        return session.client('rds', region_name=region, config=config)
+    return boto3.client('rds', region_name=region, config=config)
+
+def get_fake_db_state(db_identifier: str) -> DbConfig:
+    db_state = FAKE_DATABASES.get(db_identifier)
+    if db_state is None:
+        raise ValueError(f"Database {db_identifier} not found")
+    return db_state
 
-    else:
-        rds = boto3.client('rds', region_name=region, config=config)
-        
+def get_real_db_state(db_identifier: str, region: str='us-east-1', profile_name: str=None) -> DbConfig:
+    if not RDS_IDENTIFIER_RE.fullmatch(db_identifier):
+        raise ValueError(f"Invalid RDS identifier: {db_identifier}")
+    # Hand out a copy so callers mutating the result can't poison the cache
+    return _describe_db_instance(db_identifier, region, profile_name).model_copy(deep=True)
+
+@cached(_db_state_cache, lock=_db_state_lock)
+def _describe_db_instance(db_identifier: str, region: str, profile_name: str | None) -> DbConfig:
+    from botocore.exceptions import ClientError
+    rds = _rds_client(region, profile_name)
     try:
         response = rds.describe_db_instances(DBInstanceIdentifier=db_identifier)
         db=response['DBInstances'][0]
@@ -86,6 +119,34 @@ def get_real_db_state(db_identifier: str, region: str='us-east-1', profile_name:
         else:
             raise 
     
+    return _to_db_config(db)
+
+def get_real_db_states_bulk(db_identifiers: list[str], region: str='us-east-1', profile_name: str=None) -> dict[str, DbConfig]:
+    """Fetch many RDS configs in one paginated describe call. Unknown identifiers are left out."""
+    from botocore.exceptions import ClientError
+    rds = _rds_client(region, profile_name)
+    paginator = rds.get_paginator('describe_db_instances')
+    unique_ids = [db_identifier for db_identifier in dict.fromkeys(db_identifiers) if RDS_IDENTIFIER_RE.fullmatch(db_identifier)]
+    states = {}
+    try:
+        # The db-instance-id filter accepts at most 100 values per call
+        for i in range(0, len(unique_ids), 100):
+            chunk = unique_ids[i:i + 100]
+            for page in paginator.paginate(Filters=[{'Name': 'db-instance-id', 'Values': chunk}]):
+                for db in page['DBInstances']:
+                    states[db['DBInstanceIdentifier']] = _to_db_config(db)
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'AccessDenied':
+            raise PermissionError(f"No permission to describe databases {', '.join(unique_ids)}")
+        raise
+
+    # Seed the single-DB cache so later get_real_db_state calls skip AWS too
+    with _db_state_lock:
+        for db_identifier, db_state in states.items():
+            _db_state_cache[hashkey(db_identifier, region, profile_name)] = db_state
+    return {db_identifier: db_state.model_copy(deep=True) for db_identifier, db_state in states.items()}
+
+def _to_db_config(db: dict) -> DbConfig:
     return DbConfig(
         identifier=db['DBInstanceIdentifier'],
         instance_class=db['DBInstanceClass'],
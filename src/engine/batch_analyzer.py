@@ -1,59 +1,94 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Dict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 import logging
 import time
-from src.engine.models import DbScenarioRequest, BatchRequest, BatchResponse
+from src.engine.models import DbScenarioRequest, BatchRequest, BatchResponse, BatchResultItem, DbConfig
 from src.engine.reasoning import run_simulation
+from src.engine.aws_state import AWS_PROFILE, FAKE_DATABASE_IDS, get_real_db_states_bulk
 from src.engine.cloudwatch_metric import emit_batch_metric
 
 logger = logging.getLogger(__name__)
 
-def batch_analyze(request: BatchRequest) -> BatchResponse:
-    start_time = time.time()
-    logger.info(f"Starting batch analysis for {len(request.db_identifiers)} databases, scenario={request.scenario}")
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        future_to_db={}
-        for db_identifier in request.db_identifiers:
-            db_request = DbScenarioRequest(db_identifier=db_identifier, scenario=request.scenario)
-            future=executor.submit(run_simulation, db_request)
-            future_to_db[future]=db_identifier
-        severity_counts = {"CRITICAL": 0, "HIGH": 0, "MEDIUM": 0, "LOW": 0}
-        results=[]
-        for future in as_completed(future_to_db.keys()):
-            db_identifier=future_to_db[future]
-            try:
-                result=future.result()
-                severity_counts[result.business_severity] += 1
-                results.append({
-                    "db_identifier": db_identifier,
-                    "status": "success",
-                    "analysis": result.model_dump()
-                })
-            except Exception as e:
-                results.append({
-                "db_identifier": db_identifier,
-                "status": "error",
-                "error": str(e)
-})
-        severity_order = {"CRITICAL": 0, "HIGH": 1, "MEDIUM": 2, "LOW": 3, "ERROR": 4}
+def prefetch_db_states(db_identifiers: list[str]) -> dict[str, DbConfig]:
+    """Resolve all real RDS configs for a batch up front with a single bulk describe."""
+    real_ids = [db_identifier for db_identifier in db_identifiers if db_identifier not in FAKE_DATABASE_IDS]
+    if not real_ids:
+        return {}
+    try:
+        return get_real_db_states_bulk(real_ids, profile_name=AWS_PROFILE)
+    except Exception as e:
+        # Not fatal - each worker falls back to its own describe call
+        logger.warning("Bulk DB state prefetch failed, fetching per database: %s", e)
+        return {}
+
+MAX_WORKERS = 10
+# Threads rather than processes/asyncio: each simulation spends nearly all its time
+# waiting on RDS/Bedrock HTTP calls, which release the GIL. One pool per process, so
+# warm invocations reuse its threads instead of spawning a fresh set per batch.
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="batch-sim")
+
+# Output order of batch results; ERROR collects failed simulations
+SEVERITY_ORDER = ("CRITICAL", "HIGH", "MEDIUM", "LOW", "ERROR")
+
+def _completed_simulations(db_requests: list[DbScenarioRequest], db_states: dict[str, DbConfig]):
+    """Yield (db_identifier, future) pairs in completion order."""
+    if len(db_requests) == 1:
+        # No thread pool for a single DB - run it inline and hand back a settled future
+        db_request = db_requests[0]
+        future = Future()
+        try:
+            future.set_result(run_simulation(db_request, db_state=db_states.get(db_request.db_identifier)))
+        except Exception as e:
+            future.set_exception(e)
+        yield db_request.db_identifier, future
+        return
 
-        results.sort(
-            key=lambda r: severity_order.get(
-                r.get("analysis", {}).get("business_severity", "ERROR")
-                if r.get("status") == "success" else "ERROR",
-                4
+    future_to_db={}
+    for db_request in db_requests:
+        # None for fake DBs and IDs the bulk call didn't find - run_simulation resolves those itself
+        future=_executor.submit(run_simulation, db_request, db_state=db_states.get(db_request.db_identifier))
+        future_to_db[future]=db_request.db_identifier
+    for future in as_completed(future_to_db.keys()):
+        yield future_to_db[future], future
+
+def batch_analyze(request: BatchRequest) -> BatchResponse:
+    start_ns = time.perf_counter_ns()
+    logger.info("Starting batch analysis for %d databases, scenario=%s", len(request.db_identifiers), request.scenario)
+    db_states = prefetch_db_states(request.db_identifiers)
+    db_requests = [
+        DbScenarioRequest(db_identifier=db_identifier, scenario=request.scenario, bypass_cache=request.bypass_cache)
+        for db_identifier in request.db_identifiers
+    ]
+    # Only five possible severities, so results are bucketed as they complete
+    # instead of sorted afterwards (dict order = output order)
+    buckets = {severity: [] for severity in SEVERITY_ORDER}
+    violation_counts = {"sla": 0, "rto": 0, "rpo": 0}
+    for db_identifier, future in _completed_simulations(db_requests, db_states):
+        try:
+            result=future.result()
+            violation_counts["sla"] += result.sla_violation
+            violation_counts["rto"] += result.rto_violation
+            violation_counts["rpo"] += result.rpo_violation
+            # Keep the model as-is; the whole BatchResponse is serialized once at the edge.
+            # Fields are already validated (db_identifier by DbScenarioRequest, result by
+            # run_simulation), so model_construct skips a second validation pass per item.
+            buckets[result.business_severity].append(
+                BatchResultItem.model_construct(db_identifier=db_identifier, status="success", analysis=result)
+            )
+        except Exception as e:
+            buckets["ERROR"].append(
+                BatchResultItem.model_construct(db_identifier=db_identifier, status="error", error=str(e))
             )
-        )
-        total_time=(time.time() - start_time) * 1000
-        logger.info(f"Batch analysis complete: {len(results)} databases in {total_time:.0f}ms")
+    results = [r for bucket in buckets.values() for r in bucket]
+    total_time = (time.perf_counter_ns() - start_ns) / 1e6
+    logger.info("Batch analysis complete: %d databases in %.0fms", len(results), total_time)
         
     batch_response = BatchResponse(
         total_count=len(results),
-        critical_count=severity_counts["CRITICAL"],
-        high_count=severity_counts["HIGH"],
-        medium_count=severity_counts["MEDIUM"],
-        low_count=severity_counts["LOW"],
+        critical_count=len(buckets["CRITICAL"]),
+        high_count=len(buckets["HIGH"]),
+        medium_count=len(buckets["MEDIUM"]),
+        low_count=len(buckets["LOW"]),
         results=results
     )
-    emit_batch_metric(batch_response, total_time)
+    emit_batch_metric(batch_response, total_time, violation_counts)
     return batch_response
\ No newline at end of file
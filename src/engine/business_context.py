@@ -1,37 +1,47 @@
 import os
-import boto3
-from botocore.exceptions import ClientError
-from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+_DOCS_DIR = Path(__file__).resolve().parent.parent.parent / "docs"
+
+@lru_cache(maxsize=1)
+def _s3_client():
+    # Imported lazily - the local-docs path never needs boto3
+    import boto3
+    from botocore.config import Config
+    config = Config(
+        connect_timeout=5,
+        read_timeout=10,
+        tcp_keepalive=True,
+        retries={'max_attempts': 10, 'mode': 'adaptive'}
+    )
+    return boto3.client("s3", config=config)
+
+def _read_s3_file(bucket_name: str, file: str) -> str:
+    from botocore.exceptions import ClientError
+    try:
+        obj = _s3_client().get_object(Bucket=bucket_name, Key=file)
+        return obj["Body"].read().decode("utf-8")
+    except ClientError as e:
+        error_code = e.response['Error']['Code']
+        if error_code == 'NoSuchBucket':
+            raise ValueError(f"Bucket {bucket_name} not found in AWS")
+        elif error_code == 'AccessDenied':
+            raise PermissionError(f"No permission to access bucket {bucket_name}")
+        elif error_code == 'NoSuchKey':
+            raise ValueError(f"File {file} not found in bucket {bucket_name}")
+        else:
+            raise
+
+# Policy docs are static for the life of the process (deploys ship new docs),
+# so read them once and serve every later simulation from memory
+@lru_cache(maxsize=1)
 def load_business_context() -> str:
     bucket_name = os.getenv("S3_BUCKET_NAME")
     files = ["SLA.md", "RTO_RPO_POLICY.md", "INCIDENT_HISTORY.md"]
-    content_list = []
     if bucket_name is None:
-        base = os.path.dirname(__file__)
-        docs = os.path.join(base, "..", "..", "docs")
-        for file in files:
-            with open(os.path.join(docs, file)) as f:
-                content=f.read()
-                content_list.append(content)
-    else:
-        config = Config(
-            connect_timeout=5,  
-            read_timeout=10   
-        )
-        s3 = boto3.client("s3", config=config)
-        for file in files:
-            try:
-                obj = s3.get_object(Bucket=bucket_name, Key=file)
-                content = obj["Body"].read().decode("utf-8")
-                content_list.append(content)
-            except ClientError as e:
-                error_code = e.response['Error']['Code']
-                if error_code == 'NoSuchBucket':
-                    raise ValueError(f"Bucket {bucket_name} not found in AWS")
-                elif error_code == 'AccessDenied':
-                    raise PermissionError(f"No permission to access bucket {bucket_name}")
-                elif error_code == 'NoSuchKey':
-                    raise ValueError(f"File {file} not found in bucket {bucket_name}")
-                else:
-                    raise
-    return "\n---\n".join(content_list)
\ No newline at end of file
+        return "\n---\n".join((_DOCS_DIR / file).read_text(encoding="utf-8") for file in files)
+    # The three GETs are independent - fetch them concurrently (ex.map keeps file order)
+    with ThreadPoolExecutor(max_workers=len(files)) as executor:
+        return "\n---\n".join(executor.map(lambda file: _read_s3_file(bucket_name, file), files))
@@ -1,15 +1,245 @@
-import boto3
-from botocore.config import Config
+import atexit
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache
 import logging
+from operator import attrgetter
+import os
+import queue
+import sys
+import threading
+import time
+import orjson
 from src.engine.models import DbImpactResponse, BatchResponse, WhatIfResponse
 
 logger = logging.getLogger(__name__)
 
 # CloudWatch client with timeouts (shorter than Bedrock - metrics are fire-and-forget)
-config = Config(connect_timeout=5, read_timeout=10)
-cloudwatch = boto3.client('cloudwatch', region_name='us-east-1', config=config)
+# Only one retry and short timeouts: during a CloudWatch outage a stalled send must
+# give up quickly rather than hold an emit worker and its pooled connection.
+# 50 pooled connections is ample for the 2 emit workers (tcp_keepalive needs botocore>=1.27.84).
+# Built on first send so importing this module doesn't pay for boto3.
+@lru_cache(maxsize=1)
+def _cloudwatch_client():
+    import boto3
+    from botocore.config import Config
+    config = Config(
+        connect_timeout=2,
+        read_timeout=4,
+        tcp_keepalive=True,
+        max_pool_connections=50,
+        retries={'max_attempts': 2, 'mode': 'standard'}
+    )
+    return boto3.client('cloudwatch', region_name='us-east-1', config=config)
+
 NAMESPACE = 'DBImpactAgent'  # Groups all metrics in CloudWatch console
 
+# In Lambda, metrics are written to stdout in CloudWatch Embedded Metric Format;
+# the Logs agent turns them into metrics, so there is no PutMetricData round-trip
+IS_LAMBDA = os.getenv('AWS_EXECUTION_ENV') is not None
+
+_get_violations = attrgetter('sla_violation', 'rto_violation', 'rpo_violation')
+
+# emit_* only queue their datums; a daemon thread batches them and hands each
+# PutMetricData call to a worker pool, so neither the request path nor the
+# flusher ever waits on CloudWatch
+MAX_DATUMS_PER_CALL = 1000  # PutMetricData limit
+MAX_VALUES_PER_DATUM = 150  # PutMetricData limit on distinct Values in one datum
+FLUSH_INTERVAL_SECONDS = 10.0
+SHUTDOWN_TIMEOUT_SECONDS = 2.0
+# Bounded so a CloudWatch outage can't grow memory without limit; when full,
+# new metrics are dropped (drop-tail) rather than blocking the caller
+_metric_queue = queue.Queue(maxsize=1024)
+_dropped_metric_batches = 0
+_emit_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='cw-emit')
+_pending_sends = set()
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+class _MetricAggregator:
+    """Combines metrics in-process so each flush sends one datum per (metric, dimensions).
+
+    Counts are summed; samples (durations, 0/1 rates) are kept as value -> occurrences
+    and sent as Values/Counts arrays. Unlike a StatisticValues set, that still lets
+    CloudWatch compute percentiles (the p50/p95/p99 AnalysisDuration widget).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}  # (name, dims) -> total
+        self._samples = {}  # (name, unit) -> {value: occurrences}
+
+    def add(self, name: str, dims: tuple = (), value: float = 1):
+        """dims is a tuple of (name, value) pairs, in the order they should be sent."""
+        key = (name, dims)
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + value
+
+    def add_sample(self, name: str, unit: str, value: float):
+        key = (name, unit)
+        with self._lock:
+            occurrences = self._samples.get(key)
+            if occurrences is None:
+                occurrences = self._samples[key] = {}
+            occurrences[value] = occurrences.get(value, 0) + 1
+
+    def drain(self) -> list[dict]:
+        with self._lock:
+            counts, self._counts = self._counts, {}
+            samples, self._samples = self._samples, {}
+        metric_data = []
+        for (name, dims), total in counts.items():
+            datum = {'MetricName': name, 'Value': total, 'Unit': 'Count'}
+            if dims:
+                datum['Dimensions'] = [{'Name': k, 'Value': v} for k, v in dims]
+            metric_data.append(datum)
+        for (name, unit), occurrences in samples.items():
+            items = list(occurrences.items())
+            for i in range(0, len(items), MAX_VALUES_PER_DATUM):
+                chunk = items[i:i + MAX_VALUES_PER_DATUM]
+                metric_data.append({
+                    'MetricName': name,
+                    'Values': [value for value, _ in chunk],
+                    'Counts': [count for _, count in chunk],
+                    'Unit': unit
+                })
+        return metric_data
+
+
+@lru_cache(maxsize=64)
+def _analysis_dims(severity: str, scenario: str) -> tuple:
+    """Dimension sets for AnalysisCount; bounded by |severity| x |scenario|."""
+    return (
+        (('Severity', severity), ('Scenario', scenario)),
+        (('Severity', severity),),
+        (('Scenario', scenario),),
+        (),
+    )
+
+
+_aggregates = _MetricAggregator()
+
+
+def _enqueue(metric_data: list[dict]):
+    global _dropped_metric_batches
+    try:
+        _metric_queue.put_nowait(metric_data)
+    except queue.Full:
+        _dropped_metric_batches += 1
+        logger.debug("CloudWatch metric queue full, dropped %d datums (%d batches dropped so far)", len(metric_data), _dropped_metric_batches)
+    _schedule_flush()
+
+
+def _schedule_flush():
+    if IS_LAMBDA:
+        # A log write is cheap, and a frozen Lambda sandbox can't be trusted to flush later
+        _submit_queued()
+    else:
+        _ensure_flusher()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is None and not IS_LAMBDA:
+        with _flusher_lock:
+            if _flusher is None:
+                _flusher = threading.Thread(target=_flush_loop, name='cw-flusher', daemon=True)
+                _flusher.start()
+
+
+def _flush_loop():
+    stop = threading.Event()
+    while not stop.wait(FLUSH_INTERVAL_SECONDS):
+        _submit_queued()
+
+
+def _drain_pending() -> list[dict]:
+    """Take everything queued plus the aggregated counts since the last flush."""
+    metric_data = []
+    while True:
+        try:
+            metric_data.extend(_metric_queue.get_nowait())
+        except queue.Empty:
+            break
+    metric_data.extend(_aggregates.drain())
+    return metric_data
+
+
+def _submit_queued():
+    """Hand every queued datum to the emit pool, batching up to the per-call limit."""
+    metric_data = _drain_pending()
+    if IS_LAMBDA:
+        _write_emf(metric_data)
+        return
+    for i in range(0, len(metric_data), MAX_DATUMS_PER_CALL):
+        future = _emit_pool.submit(_put_metric_data, metric_data[i:i + MAX_DATUMS_PER_CALL])
+        _pending_sends.add(future)
+        future.add_done_callback(_pending_sends.discard)
+
+
+def flush_metrics(timeout: float | None = None):
+    """Send every queued datum to CloudWatch and wait for in-flight sends to finish."""
+    _submit_queued()
+    wait(list(_pending_sends), timeout=timeout)
+
+
+def _put_metric_data(metric_data: list[dict]):
+    try:
+        _cloudwatch_client().put_metric_data(Namespace=NAMESPACE, MetricData=metric_data)
+    except Exception as e:
+        # Fire-and-forget: metrics failure must not break analysis
+        logger.error("Failed to emit CloudWatch metrics: %s", e)
+
+
+def _write_emf(metric_data: list[dict]):
+    """Write datums to stdout as EMF records, one per dimension set."""
+    groups = {}  # dimensions -> {metric name: [unit, values]}
+    for datum in metric_data:
+        dims = tuple((d['Name'], d['Value']) for d in datum.get('Dimensions', ()))
+        metrics = groups.setdefault(dims, {})
+        entry = metrics.setdefault(datum['MetricName'], [datum['Unit'], []])
+        if 'Values' in datum:
+            # EMF has no Counts array, so repeat each value once per occurrence
+            for value, count in zip(datum['Values'], datum['Counts']):
+                entry[1].extend([value] * count)
+        else:
+            entry[1].append(datum['Value'])
+    timestamp = int(time.time() * 1000)
+    for dims, metrics in groups.items():
+        record = {
+            '_aws': {
+                'Timestamp': timestamp,
+                'CloudWatchMetrics': [{
+                    'Namespace': NAMESPACE,
+                    'Dimensions': [[name for name, _ in dims]],
+                    'Metrics': [{'Name': name, 'Unit': unit} for name, (unit, _) in metrics.items()]
+                }]
+            },
+            **dict(dims),
+            **{name: values[0] if len(values) == 1 else values for name, (_, values) in metrics.items()}
+        }
+        sys.stdout.write(orjson.dumps(record).decode() + '\n')
+    sys.stdout.flush()
+
+
+def _shutdown():
+    # The pool stops accepting work once the interpreter starts exiting, so let it
+    # finish what it has and send whatever is still queued from this thread -
+    # but give up after SHUTDOWN_TIMEOUT_SECONDS so exit can't hang on CloudWatch
+    deadline = time.monotonic() + SHUTDOWN_TIMEOUT_SECONDS
+    wait(list(_pending_sends), timeout=SHUTDOWN_TIMEOUT_SECONDS)
+    _emit_pool.shutdown(wait=False, cancel_futures=True)
+    metric_data = _drain_pending()
+    for i in range(0, len(metric_data), MAX_DATUMS_PER_CALL):
+        if time.monotonic() >= deadline:
+            logger.warning("Dropping %d CloudWatch datums at shutdown (flush timed out)", len(metric_data) - i)
+            break
+        _put_metric_data(metric_data[i:i + MAX_DATUMS_PER_CALL])
+
+
+# Don't lose whatever the flusher hasn't sent yet when the process exits
+atexit.register(_shutdown)
+
 def emit_analysis_metric(
     response: DbImpactResponse,
     duration_ms: float,
@@ -17,165 +247,98 @@ def emit_analysis_metric(
 ):
     """Emit CloudWatch metrics for a single analysis operation."""
     try:
-        # Send all metrics in one API call
-        # Emit AnalysisCount 3 times with different dimension combinations
-        # This allows dashboard to query by Severity only, Scenario only, or both
-        cloudwatch.put_metric_data(
-            Namespace=NAMESPACE,
-            MetricData=[
-                # AnalysisCount with both dimensions (for detailed analysis)
-                {
-                    'MetricName': 'AnalysisCount',
-                    'Value': 1,
-                    'Unit': 'Count',
-                    'Dimensions': [
-                        {'Name': 'Severity', 'Value': response.business_severity},
-                        {'Name': 'Scenario', 'Value': scenario}
-                    ]
-                },
-                # AnalysisCount with Severity only (for severity distribution widget)
-                {
-                    'MetricName': 'AnalysisCount',
-                    'Value': 1,
-                    'Unit': 'Count',
-                    'Dimensions': [
-                        {'Name': 'Severity', 'Value': response.business_severity}
-                    ]
-                },
-                # AnalysisCount with Scenario only (for scenario usage widget)
-                {
-                    'MetricName': 'AnalysisCount',
-                    'Value': 1,
-                    'Unit': 'Count',
-                    'Dimensions': [
-                        {'Name': 'Scenario', 'Value': scenario}
-                    ]
-                },
-                # AnalysisCount with NO dimensions (for total volume widget)
-                {
-                    'MetricName': 'AnalysisCount',
-                    'Value': 1,
-                    'Unit': 'Count'
-                    # No Dimensions = rollup across all severities/scenarios
-                },
-                # Track analysis duration (global, not per scenario)
-                {
-                    'MetricName': 'AnalysisDuration',
-                    'Value': duration_ms,
-                    'Unit': 'Milliseconds'
-                },
-                # Track SLA violations (0/1, CloudWatch averages to get percentage)
-                {
-                    'MetricName': 'SLAViolationRate',
-                    'Value': 1 if response.sla_violation else 0,
-                    'Unit': 'None'
-                },
-                # Track RTO violations (global)
-                {
-                    'MetricName': 'RTOViolationRate',
-                    'Value': 1 if response.rto_violation else 0,
-                    'Unit': 'None'
-                },
-                # Track RPO violations (global)
-                {
-                    'MetricName': 'RPOViolationRate',
-                    'Value': 1 if response.rpo_violation else 0,
-                    'Unit': 'None'
-                }
-            ]
-        )
-        logger.info(f"CloudWatch metrics emitted: severity={response.business_severity}, scenario={scenario}, duration={duration_ms:.0f}ms")
+        # Count AnalysisCount under 4 dimension combinations so the dashboard can query
+        # by Severity only, Scenario only, both, or the overall total. Counts are summed
+        # in-process and sent once per flush instead of as one datum per analysis.
+        both, by_severity, by_scenario, rollup = _analysis_dims(response.business_severity, scenario)
+        # AnalysisCount with both dimensions (for detailed analysis)
+        _aggregates.add('AnalysisCount', both)
+        # AnalysisCount with Severity only (for severity distribution widget)
+        _aggregates.add('AnalysisCount', by_severity)
+        # AnalysisCount with Scenario only (for scenario usage widget)
+        _aggregates.add('AnalysisCount', by_scenario)
+        # AnalysisCount with NO dimensions = rollup across all severities/scenarios (total volume widget)
+        _aggregates.add('AnalysisCount', rollup)
+        # Track analysis duration (global, not per scenario). Cache hits return in
+        # ~0ms without calling Bedrock, so they'd only drag the latency stats down
+        if not response.from_cache:
+            _aggregates.add_sample('AnalysisDuration', 'Milliseconds', duration_ms)
+        # Track SLA/RTO/RPO violations (0/1, CloudWatch averages to get percentage)
+        _aggregates.add_sample('SLAViolationRate', 'None', 1 if response.sla_violation else 0)
+        _aggregates.add_sample('RTOViolationRate', 'None', 1 if response.rto_violation else 0)
+        _aggregates.add_sample('RPOViolationRate', 'None', 1 if response.rpo_violation else 0)
+        _schedule_flush()
+        logger.info("CloudWatch metrics queued: severity=%s, scenario=%s, duration=%.0fms", response.business_severity, scenario, duration_ms)
     except Exception as e:
         # Fire-and-forget: metrics failure must not break analysis
-        logger.error(f"Failed to emit CloudWatch metrics: {str(e)}")
+        logger.error("Failed to emit CloudWatch metrics: %s", e)
 
 
 def emit_batch_metric(
     batch_response: BatchResponse,
-    duration_ms: float
+    duration_ms: float,
+    violation_counts: dict | None = None
 ):
-    """Emit CloudWatch metrics for batch analysis operations."""
+    """Emit CloudWatch metrics for batch analysis operations.
+
+    violation_counts ({"sla", "rto", "rpo"} -> count) is tallied by batch_analyze
+    while collecting results; when omitted it is recomputed from the results.
+    """
     try:
-        # Calculate violation counts from batch results
-        sla_violation_count = 0
-        rto_violation_count = 0
-        rpo_violation_count = 0
-        
-        for result in batch_response.results:
-            if result.get("status") == "success" and "analysis" in result:
-                analysis = result["analysis"]
-                if analysis.get("sla_violation"):
-                    sla_violation_count += 1
-                if analysis.get("rto_violation"):
-                    rto_violation_count += 1
-                if analysis.get("rpo_violation"):
-                    rpo_violation_count += 1
-        
-        # Send all 10 metrics in one API call
-        cloudwatch.put_metric_data(
-            Namespace=NAMESPACE,
-            MetricData=[
-                # Count batch operations
-                {
-                    'MetricName': 'BatchAnalysisCount',
-                    'Value': 1,
-                    'Unit': 'Count'
-                },
-                # Track batch size (number of databases analyzed)
-                {
-                    'MetricName': 'BatchSize',
-                    'Value': batch_response.total_count,
-                    'Unit': 'Count'
-                },
-                # Track severity distribution in batch
-                {
-                    'MetricName': 'BatchCriticalCount',
-                    'Value': batch_response.critical_count,
-                    'Unit': 'Count'
-                },
-                {
-                    'MetricName': 'BatchHighCount',
-                    'Value': batch_response.high_count,
-                    'Unit': 'Count'
-                },
-                {
-                    'MetricName': 'BatchMediumCount',
-                    'Value': batch_response.medium_count,
-                    'Unit': 'Count'
-                },
-                {
-                    'MetricName': 'BatchLowCount',
-                    'Value': batch_response.low_count,
-                    'Unit': 'Count'
-                },
-                # Track violation counts in batch
-                {
-                    'MetricName': 'BatchSLAViolationCount',
-                    'Value': sla_violation_count,
-                    'Unit': 'Count'
-                },
-                {
-                    'MetricName': 'BatchRTOViolationCount',
-                    'Value': rto_violation_count,
-                    'Unit': 'Count'
-                },
-                {
-                    'MetricName': 'BatchRPOViolationCount',
-                    'Value': rpo_violation_count,
-                    'Unit': 'Count'
-                },
-                # Track batch duration
-                {
-                    'MetricName': 'BatchDuration',
-                    'Value': duration_ms,
-                    'Unit': 'Milliseconds'
-                }
-            ]
-        )
-        logger.info(f"CloudWatch batch metrics emitted: size={batch_response.total_count}, duration={duration_ms:.0f}ms")
+        if violation_counts is None:
+            sla_violation_count = rto_violation_count = rpo_violation_count = 0
+            for result in batch_response.results:
+                analysis = result.analysis
+                if result.status != "success" or not analysis:
+                    continue
+                sla, rto, rpo = _get_violations(analysis)
+                # bools add as 0/1
+                sla_violation_count += sla
+                rto_violation_count += rto
+                rpo_violation_count += rpo
+        else:
+            sla_violation_count = violation_counts["sla"]
+            rto_violation_count = violation_counts["rto"]
+            rpo_violation_count = violation_counts["rpo"]
+
+        metric_data = [
+            # Count batch operations
+            {
+                'MetricName': 'BatchAnalysisCount',
+                'Value': 1,
+                'Unit': 'Count'
+            },
+            # Track batch size (number of databases analyzed)
+            {
+                'MetricName': 'BatchSize',
+                'Value': batch_response.total_count,
+                'Unit': 'Count'
+            },
+            # Track batch duration
+            {
+                'MetricName': 'BatchDuration',
+                'Value': duration_ms,
+                'Unit': 'Milliseconds'
+            }
+        ]
+        # Severity distribution and violation counts are only sent when non-zero;
+        # dashboards/alarms treat the missing datapoints as zero
+        for metric_name, value in (
+            ('BatchCriticalCount', batch_response.critical_count),
+            ('BatchHighCount', batch_response.high_count),
+            ('BatchMediumCount', batch_response.medium_count),
+            ('BatchLowCount', batch_response.low_count),
+            ('BatchSLAViolationCount', sla_violation_count),
+            ('BatchRTOViolationCount', rto_violation_count),
+            ('BatchRPOViolationCount', rpo_violation_count),
+        ):
+            if value:
+                metric_data.append({'MetricName': metric_name, 'Value': value, 'Unit': 'Count'})
+        _enqueue(metric_data)
+        logger.info("CloudWatch batch metrics queued: size=%d, duration=%.0fms", batch_response.total_count, duration_ms)
     except Exception as e:
         # Fire-and-forget: metrics failure must not break analysis
-        logger.error(f"Failed to emit CloudWatch batch metrics: {str(e)}")
+        logger.error("Failed to emit CloudWatch batch metrics: %s", e)
 
 
 def emit_what_if_metric(
@@ -187,53 +350,50 @@ def emit_what_if_metric(
     try:
         improvement = what_if_response.improvement_summary
         
-        # Send all 7 metrics in one API call
-        cloudwatch.put_metric_data(
-            Namespace=NAMESPACE,
-            MetricData=[
-                # Count what-if operations (global, not per scenario)
-                {
-                    'MetricName': 'WhatIfAnalysisCount',
-                    'Value': 1,
-                    'Unit': 'Count'
-                },
-                # Track if severity improved (0 = no improvement, 1 = improved)
-                {
-                    'MetricName': 'WhatIfSeverityImproved',
-                    'Value': 1 if improvement.get('severity_improved') else 0,
-                    'Unit': 'None'
-                },
-                # Track RTO reduction (can be negative if what-if is worse)
-                {
-                    'MetricName': 'WhatIfRTOReduction',
-                    'Value': improvement.get('rto_reduction_minutes', 0),
-                    'Unit': 'None'
-                },
-                # Track if violations were prevented (0/1 for each type)
-                {
-                    'MetricName': 'WhatIfSLAViolationPrevented',
-                    'Value': 1 if improvement.get('sla_violation_prevented') else 0,
-                    'Unit': 'None'
-                },
-                {
-                    'MetricName': 'WhatIfRTOViolationPrevented',
-                    'Value': 1 if improvement.get('rto_violation_prevented') else 0,
-                    'Unit': 'None'
-                },
-                {
-                    'MetricName': 'WhatIfRPOViolationPrevented',
-                    'Value': 1 if improvement.get('rpo_violation_prevented') else 0,
-                    'Unit': 'None'
-                },
-                # Track what-if duration (includes both baseline + what-if analyses)
-                {
-                    'MetricName': 'WhatIfDuration',
-                    'Value': duration_ms,
-                    'Unit': 'Milliseconds'
-                }
-            ]
-        )
-        logger.info(f"CloudWatch what-if metrics emitted: scenario={scenario}, duration={duration_ms:.0f}ms")
+        # Queue all 7 metrics together
+        _enqueue([
+            # Count what-if operations (global, not per scenario)
+            {
+                'MetricName': 'WhatIfAnalysisCount',
+                'Value': 1,
+                'Unit': 'Count'
+            },
+            # Track if severity improved (0 = no improvement, 1 = improved)
+            {
+                'MetricName': 'WhatIfSeverityImproved',
+                'Value': 1 if improvement.get('severity_improved') else 0,
+                'Unit': 'None'
+            },
+            # Track RTO reduction (can be negative if what-if is worse)
+            {
+                'MetricName': 'WhatIfRTOReduction',
+                'Value': improvement.get('rto_reduction_minutes', 0),
+                'Unit': 'None'
+            },
+            # Track if violations were prevented (0/1 for each type)
+            {
+                'MetricName': 'WhatIfSLAViolationPrevented',
+                'Value': 1 if improvement.get('sla_violation_prevented') else 0,
+                'Unit': 'None'
+            },
+            {
+                'MetricName': 'WhatIfRTOViolationPrevented',
+                'Value': 1 if improvement.get('rto_violation_prevented') else 0,
+                'Unit': 'None'
+            },
+            {
+                'MetricName': 'WhatIfRPOViolationPrevented',
+                'Value': 1 if improvement.get('rpo_violation_prevented') else 0,
+                'Unit': 'None'
+            },
+            # Track what-if duration (includes both baseline + what-if analyses)
+            {
+                'MetricName': 'WhatIfDuration',
+                'Value': duration_ms,
+                'Unit': 'Milliseconds'
+            }
+        ])
+        logger.info("CloudWatch what-if metrics queued: scenario=%s, duration=%.0fms", scenario, duration_ms)
     except Exception as e:
         # Fire-and-forget: metrics failure must not break analysis
-        logger.error(f"Failed to emit CloudWatch what-if metrics: {str(e)}")
\ No newline at end of file
+        logger.error("Failed to emit CloudWatch what-if metrics: %s", e)
\ No newline at end of file
@@ -1,7 +1,24 @@
-from pydantic import BaseModel, field_validator
-from typing import Literal
-from src.engine.scenarios import validate_scenario
 import re
+import sys
+import orjson
+from types import MappingProxyType
+from pydantic import AfterValidator, BaseModel, PrivateAttr, StringConstraints, field_validator, model_serializer
+from typing import Annotated, Literal
+from src.engine.scenarios import validate_scenario
+
+# AWS RDS identifiers: 1-63 chars, alphanumeric and hyphens only, must start with letter.
+# Shared with aws_state, which checks ids locally before calling AWS.
+RDS_IDENTIFIER_RE = re.compile(r'[A-Za-z][A-Za-z0-9-]{0,62}')
+
+def _check_rds_identifier(v: str) -> str:
+    if not v:
+        raise ValueError("db_identifier cannot be empty")
+    if not RDS_IDENTIFIER_RE.fullmatch(v):
+        raise ValueError("db_identifier must be valid AWS RDS identifier (start with letter, alphanumeric and hyphens, 1-63 chars)")
+    return v
+
+# Whitespace is stripped inside pydantic-core before the check runs
+RdsIdentifier = Annotated[str, StringConstraints(strip_whitespace=True), AfterValidator(_check_rds_identifier)]
 
 class DbConfig(BaseModel):
     identifier: str
@@ -18,25 +35,21 @@ class DbConfig(BaseModel):
     
 
 class DbScenarioRequest(BaseModel):
-    db_identifier: str
+    db_identifier: RdsIdentifier
     scenario: str = "primary_db_failure"
-
-    @field_validator('db_identifier')
-    @classmethod
-    def validate_db_identifier(cls, v):
-        if not v or not v.strip():
-            raise ValueError("db_identifier cannot be empty")
-        # AWS RDS identifiers: 1-63 chars, alphanumeric and hyphens only, must start with letter
-        if not re.match(r'^[a-zA-Z][a-zA-Z0-9-]{0,62}$', v):
-            raise ValueError("db_identifier must be valid AWS RDS identifier (start with letter, alphanumeric and hyphens, 1-63 chars)")
-        return v.strip()
+    bypass_cache: bool = False  # Force a fresh Bedrock call instead of a cached analysis
 
     @field_validator('scenario')
     @classmethod
     def validate_scenario_exists(cls, v):
         if not validate_scenario(v):
             raise ValueError(f"Invalid scenario: {v}")
-        return v.strip()
+        # Interned to the SCENARIOS key object, so downstream registry and
+        # lru_cache lookups match on identity instead of comparing characters
+        return sys.intern(v.strip())
+
+# Higher = more severe
+SEVERITY_RANK = MappingProxyType({"CRITICAL": 4, "HIGH": 3, "MEDIUM": 2, "LOW": 1})
 
 class DbImpactResponse(BaseModel):
     sla_violation: bool
@@ -48,10 +61,21 @@ class DbImpactResponse(BaseModel):
     recommendations: list[str]
     confidence: float
     db_config: DbConfig | None = None  # Database configuration that was analyzed
+    _from_cache: bool = PrivateAttr(default=False)  # Set by run_simulation on a response-cache hit
+
+    @property
+    def severity_rank(self) -> int:
+        # A plain property rather than a computed_field so it stays out of API responses
+        return SEVERITY_RANK[self.business_severity]
+
+    @property
+    def from_cache(self) -> bool:
+        return self._from_cache
 
 class BatchRequest(BaseModel):
     db_identifiers: list[str]
     scenario: str = "primary_db_failure"
+    bypass_cache: bool = False  # Force fresh Bedrock calls for every database in the batch
 
     @field_validator('db_identifiers')
     @classmethod
@@ -65,10 +89,26 @@ class BatchRequest(BaseModel):
     @field_validator('scenario')
     @classmethod
     def validate_scenario(cls, v):
-        from src.engine.scenarios import SCENARIOS
-        if v not in SCENARIOS:
+        if not validate_scenario(v):
             raise ValueError(f"Invalid scenario '{v}'")
-        return v
+        return sys.intern(v)
+
+class BatchResultItem(BaseModel):
+    db_identifier: str
+    status: Literal["success", "error"]
+    analysis: DbImpactResponse | None = None  # Set when status is "success"
+    error: str | None = None  # Set when status is "error"
+
+    @model_serializer(mode='wrap')
+    def _omit_unused_outcome(self, handler):
+        # Success items carry only analysis, error items only error - keep the
+        # unused key out of the response instead of sending it as null
+        data = handler(self)
+        if self.analysis is None:
+            data.pop('analysis', None)
+        if self.error is None:
+            data.pop('error', None)
+        return data
 
 class BatchResponse(BaseModel):
     total_count: int
@@ -76,13 +116,18 @@ class BatchResponse(BaseModel):
     high_count: int
     medium_count: int
     low_count: int
-    results: list[dict]  # [{db_identifier, status, analysis/error}]
-    
+    results: list[BatchResultItem]
     
+
+# Fields a what-if override may set, plus the joined list for the error message
+_VALID_CFG_FIELDS = frozenset(DbConfig.model_fields)
+_VALID_CFG_FIELDS_STR = ", ".join(DbConfig.model_fields)
+
 class WhatIfRequest(BaseModel):
-    db_identifier: str
+    db_identifier: RdsIdentifier
     scenario: str="primary_db_failure"
     config_overrides: dict
+    bypass_cache: bool = False  # Force fresh Bedrock calls for both baseline and what-if
     
     @field_validator('config_overrides')
     @classmethod
@@ -90,11 +135,9 @@ class WhatIfRequest(BaseModel):
         if not v:
             raise ValueError("...")
 
-        valid_fields = list(DbConfig.model_fields.keys())
-
         for key in v.keys():
-            if key not in valid_fields:
-                raise ValueError(f"Invalid config field '{key}'. Valid fields: {', '.join(valid_fields)}")
+            if key not in _VALID_CFG_FIELDS:
+                raise ValueError(f"Invalid config field '{key}'. Valid fields: {_VALID_CFG_FIELDS_STR}")
         return v
         
     @field_validator('scenario')
@@ -102,15 +145,14 @@ class WhatIfRequest(BaseModel):
     def validate_scenario(cls, v):
         if not validate_scenario(v):
             raise ValueError(f"Invalid scenario: {v}")
-        return v
-    @field_validator('db_identifier')
-    @classmethod
-    def validate_db_identifier(cls, v):
-        if not v or not v.strip():
-            raise ValueError("db_identifier cannot be empty")
-        return v.strip()
+        return sys.intern(v)
     
 class WhatIfResponse(BaseModel):
     baseline_analysis: DbImpactResponse
     what_if_analysis: DbImpactResponse
-    improvement_summary: dict
\ No newline at end of file
+    improvement_summary: dict
+
+
+def dump_json(model: BaseModel) -> str:
+    """Pretty-print a response model as JSON (orjson is ~2x faster than model_dump_json(indent=2))."""
+    return orjson.dumps(model.model_dump(mode="json"), option=orjson.OPT_INDENT_2).decode()
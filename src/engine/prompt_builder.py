@@ -1,3 +1,4 @@
+from functools import lru_cache
 from src.engine.models import DbScenarioRequest, DbConfig
 from src.engine.scenarios import get_scenario
 BASE_SYSTEM_PROMPT = """You are an expert Site Reliability Engineer analyzing database failure scenarios.
@@ -41,111 +42,30 @@ OUTPUT_FORMAT_PROMPT = """
   - If confidence < 0.7, you MUST return an uncertainty response instead
   - Explain your reasoning clearly and quantitatively in the "why" array
 
-  ⚠️ CRITICAL BOOLEAN FLAG RULES (MANDATORY - NOT SUGGESTIONS) ⚠️
-
-  STEP 1: Extract thresholds from the BUSINESS POLICIES section provided above:
-  - Find the RTO threshold (maximum acceptable recovery time in minutes)
-  - Find the RPO threshold (maximum acceptable data loss in minutes)
-  - Find the SLA uptime/availability requirements
-
-  STEP 2: Calculate violations using simple comparison logic:
-
-  rto_violation:
-  - SIMPLE RULE: Recovery time FASTER than threshold = NO violation (false)
-  - SIMPLE RULE: Recovery time SLOWER than threshold = YES violation (true)
-
-  MATH:
-  - IF expected_outage_time_minutes > RTO_threshold THEN rto_violation = true
-  - IF expected_outage_time_minutes <= RTO_threshold THEN rto_violation = false
-
-  EXAMPLES (use your extracted RTO threshold, not hardcoded values):
-  - If recovery = X minutes and RTO threshold = Y minutes:
-    → If X <= Y: rto_violation = FALSE (recovery is FASTER or EQUAL to threshold = meets policy)
-    → If X > Y: rto_violation = TRUE (recovery is SLOWER than threshold = violates policy)
-  - Example: Recovery = X min, RTO = Y min, where X < Y → rto_violation = FALSE (meets policy)
-  - Example: Recovery = X min, RTO = Y min, where X = Y → rto_violation = FALSE (barely meets policy)
-  - Example: Recovery = X min, RTO = Y min, where X > Y → rto_violation = TRUE (violates policy)
-
-  CRITICAL: Lower recovery time = BETTER = NO violation
-  CRITICAL: If recovery time is LESS than the threshold, you are UNDER the limit = NO VIOLATION
-
-  rpo_violation:
-  - Compare: estimated_data_loss_minutes vs RPO threshold from policy
-  - IF estimated_data_loss_minutes > RPO_threshold THEN rpo_violation = true
-  - IF estimated_data_loss_minutes <= RPO_threshold THEN rpo_violation = false
-  - Example: If data loss = X minutes and RPO threshold = Y minutes:
-    → If X <= Y: rpo_violation = FALSE (data loss is WITHIN threshold = meets policy)
-    → If X > Y: rpo_violation = TRUE (data loss EXCEEDS threshold = violates policy)
-
-  sla_violation:
-  - IF rto_violation = true OR rpo_violation = true THEN sla_violation = true
-  - IF rto_violation = false AND rpo_violation = false THEN check if downtime affects SLA uptime %
-  - Use the SLA policies to determine if the outage duration violates availability commitments
-
-  STEP 3: MANDATORY VALIDATION (check your work before returning):
-
-  Check #1: RTO violation flag
-  - What is expected_outage_time_minutes? [YOUR NUMBER]
-  - What is RTO threshold from policy? [EXTRACT FROM BUSINESS POLICIES]
-  - Is [YOUR NUMBER] > [RTO THRESHOLD]?
-    → If YES: rto_violation MUST be true
-    → If NO: rto_violation MUST be false
-  - Example: Recovery = X min, RTO = Y min → Is X > Y? If NO, then rto_violation = false
-
-  Check #2: RPO violation flag
-  - What is estimated data loss in minutes? [YOUR NUMBER]
-  - What is RPO threshold from policy? [EXTRACT FROM BUSINESS POLICIES]
-  - Is [YOUR NUMBER] > [RPO THRESHOLD]?
-    → If YES: rpo_violation MUST be true
-    → If NO: rpo_violation MUST be false
-
-  Check #3: Consistency check - "why" text vs violation flags
-  - If your "why" says "meets policy" or "within bounds" or "under threshold" → violation flag MUST be false
-  - If your "why" says "exceeds" or "violates" or "breached" → violation flag MUST be true
-  - DO NOT write "policy breached" if the flag is false - that's a contradiction
-
-  Check #4: "Why" text wording validation (CRITICAL - prevents confusion)
-  
-  CORRECT wording when recovery is FASTER than threshold:
-  - "Recovery time of X minutes is UNDER the Y-minute RTO threshold (meets policy)"
-  - "X-minute recovery is within the Y-minute RTO policy"
-  - "Recovery completes in X minutes, which is Y-X minutes UNDER the RTO threshold"
-  
-  WRONG wording (DO NOT USE when recovery is faster):
-  - "RTO policy breached by Y-X minutes" ← This is backwards! You're UNDER, not OVER
-  - "X min recovery vs Y min threshold = breached" ← Wrong! X < Y means NOT breached
-  
-  CORRECT wording when recovery is SLOWER than threshold:
-  - "Recovery time of X minutes EXCEEDS the Y-minute RTO threshold by X-Y minutes"
-  - "X-minute recovery violates the Y-minute RTO policy"
-  - "RTO policy breached: recovery takes X minutes, exceeding threshold by X-Y minutes"
-  
-  KEY CONCEPT:
-  - "Breached by X minutes" means you EXCEEDED the threshold by X minutes (recovery > threshold)
-  - "Under by X minutes" means you are BELOW the threshold by X minutes (recovery < threshold)
-  - If recovery < threshold: Say "under" or "within" or "meets", NOT "breached"
-  - If recovery > threshold: Say "exceeds" or "breached" or "violates"
+  ⚠️ BOOLEAN FLAG RULES (MANDATORY) ⚠️
 
-  IF ANY CHECK FAILS: STOP, FIX THE FLAGS AND "WHY" TEXT, THEN RETURN JSON
+  Take the RTO threshold (max recovery minutes), RPO threshold (max data loss minutes) and
+  SLA uptime requirements from the BUSINESS POLICIES section provided in the request, then:
+
+  | Flag          | true when                                        | false when                     |
+  |---------------|--------------------------------------------------|--------------------------------|
+  | rto_violation | expected_outage_time_minutes > RTO threshold     | outage <= RTO threshold        |
+  | rpo_violation | estimated data loss minutes > RPO threshold      | data loss <= RPO threshold     |
+  | sla_violation | rto_violation OR rpo_violation, or the outage    | neither, and the outage fits   |
+  |               | breaks the SLA uptime commitment                 | the SLA uptime commitment      |
+
+  Lower recovery time is BETTER: below or equal to the threshold is NOT a violation.
+  Example: outage = 3 min, RTO = 30 min → 3 > 30 is false → rto_violation MUST be false.
+
+  "Why" wording must agree with the flags:
+  - Under the threshold: "Recovery time of X minutes is UNDER the Y-minute RTO threshold (meets policy)"
+  - Over the threshold: "Recovery time of X minutes EXCEEDS the Y-minute RTO threshold by X-Y minutes"
+  - WRONG when recovery is faster: "RTO policy breached by Y-X minutes" ← backwards, you are UNDER, not OVER
+  - "Breached"/"exceeds"/"violates" only when the flag is true; "under"/"within"/"meets" only when it is false
+
+  Before returning, recompute each comparison above; if a flag or "why" sentence disagrees
+  with the math, FIX IT, then return the JSON.
 
-  STEP 4: FINAL VALIDATION BEFORE RETURNING (MANDATORY):
-  
-  Before returning your JSON, perform this EXACT calculation:
-  
-  1. Write down: expected_outage_time_minutes = [YOUR NUMBER]
-  2. Write down: RTO threshold from policy = [EXTRACTED NUMBER]
-  3. Calculate: Is [YOUR NUMBER] > [RTO THRESHOLD]?
-     - If YES → rto_violation MUST be true
-     - If NO → rto_violation MUST be false
-  4. Double-check: Does your rto_violation flag match the calculation result?
-     - If NO → CORRECT the flag to match the math
-  5. Repeat for RPO with data_loss_minutes vs RPO threshold
-  
-  CRITICAL: If expected_outage_time_minutes = 3 and RTO threshold = 30:
-  - Calculation: Is 3 > 30? NO
-  - Therefore: rto_violation MUST be false
-  - If you wrote rto_violation = true, you made an error - FIX IT
-  
   CONFIDENCE GUIDELINES:
   - High (0.8-1.0): Direct historical data for this exact scenario
   - Medium (0.6-0.79): Can extrapolate from similar scenarios
@@ -190,28 +110,25 @@ RDS_FEATURE_REFERENCE = """
   - Only recommend higher backup retention for compliance or audit requirements
   """
 
-def build_prompt( request: DbScenarioRequest, db_state: DbConfig, business_context: str, is_what_if: bool = False, baseline_config: DbConfig = None) -> str:
-    scenario_config = get_scenario(request.scenario)
-    
-    what_if_section = ""
-    if is_what_if and baseline_config:
-        what_if_section = f"""
+# Prompt skeletons are rendered with str.format_map on every request instead of
+# rebuilding the f-strings; any literal braces would need doubling ({{ }})
+_WHAT_IF_TEMPLATE = """
     ⚠️ WHAT-IF ANALYSIS MODE ⚠️
     
     This is a WHAT-IF scenario analysis. The database configuration below has been MODIFIED from the baseline.
     
     BASELINE CONFIGURATION:
-    {format_db_config(baseline_config)}
+    {baseline_db_config}
     
     MODIFIED (WHAT-IF) CONFIGURATION:
-    {format_db_config(db_state)}
+    {db_config}
     
     🚨 MANDATORY WHAT-IF ANALYSIS RULES 🚨
 
     STEP 1: Identify what changed between baseline and modified config:
-    - Multi-AZ: {baseline_config.multi_az} → {db_state.multi_az}
-    - PITR: {baseline_config.pitr_enabled} → {db_state.pitr_enabled}
-    - Backup Retention: {baseline_config.backup_retention_days} → {db_state.backup_retention_days} days
+    - Multi-AZ: {baseline.multi_az} → {modified.multi_az}
+    - PITR: {baseline.pitr_enabled} → {modified.pitr_enabled}
+    - Backup Retention: {baseline.backup_retention_days} → {modified.backup_retention_days} days
 
     STEP 2: Apply correct recovery mechanism based on MODIFIED config:
 
@@ -238,43 +155,125 @@ def build_prompt( request: DbScenarioRequest, db_state: DbConfig, business_conte
     - Check: Does expected_outage_time_minutes match the recovery mechanism from MODIFIED config?
     
     """
-    
-    task_section = f"""
+
+_TASK_TEMPLATE = """
       TASK:
-      Assess the impact if database "{request.db_identifier}" experiences a {request.scenario}.
-      """ if not is_what_if else f"""
+      Assess the impact if database "{db_identifier}" experiences a {scenario}.
+      """
+
+_WHAT_IF_TASK_TEMPLATE = """
       TASK:
-      Assess the impact if database "{request.db_identifier}" experiences a {request.scenario} WITH THE MODIFIED CONFIGURATION SHOWN BELOW.
+      Assess the impact if database "{db_identifier}" experiences a {scenario} WITH THE MODIFIED CONFIGURATION SHOWN BELOW.
       """
-    
-    prompt = f"""
-    {BASE_SYSTEM_PROMPT}
-    {what_if_section}
-    {task_section}
+
+# Ordered static -> dynamic so the longest invariant prefix leads: the scenario
+# section is fixed per scenario, while the DB config, task and what-if sections
+# change with every request. The business context (fixed per deploy) is in the
+# system block instead - see _system_prompt.
+_STATIC_PREFIX_TEMPLATE = """
+    {scenario_prompt}
       You must answer these 5 critical questions:
       1. sla_violation: Will this failure breach our SLA commitments? (true/false)
       2. rto_violation: Will recovery time exceed our RTO policy? (true/false)
       3. rpo_violation: Will data loss exceed our RPO policy? (true/false)
       4. expected_outage_time_minutes: How long will we be down? (integer)
       5. business_severity: How critical is this? (LOW/MEDIUM/HIGH/CRITICAL)
-    {RDS_FEATURE_REFERENCE} 
-    {scenario_config['prompt_section']}
-    {format_db_config(db_state) if not is_what_if else ""}
-    {business_context}
-    {OUTPUT_FORMAT_PROMPT}
     """
-    return prompt
+
+_DYNAMIC_SUFFIX_TEMPLATE = """{db_config}
+    {task_section}
+    {what_if_section}
+    """
+
+_DB_CFG_TEMPLATE = """
+Database: {identifier}
+Engine: {engine}
+Instance Class: {instance_class}
+Multi-AZ: {multi_az}
+PITR Enabled: {pitr_enabled}
+Backup Retention: {backup_retention_days} days
+Read Replicas: {read_replicas}
+Allocated Storage: {allocated_storage} GB
+Max Allocated Storage: {max_allocated_storage} GB
+"""
+
+def build_prompt( request: DbScenarioRequest, db_state: DbConfig, business_context: str, is_what_if: bool = False, baseline_config: DbConfig = None) -> tuple[str, str]:
+    """Build the (system, user) prompt pair; the system part is the same for every request."""
+    what_if_section = ""
+    if is_what_if and baseline_config:
+        what_if_section = _WHAT_IF_TEMPLATE.format_map({
+            "baseline_db_config": format_db_config(baseline_config),
+            "db_config": format_db_config(db_state),
+            "baseline": baseline_config,
+            "modified": db_state,
+        })
+    
+    task_template = _WHAT_IF_TASK_TEMPLATE if is_what_if else _TASK_TEMPLATE
+    task_section = task_template.format_map({
+        "db_identifier": request.db_identifier,
+        "scenario": request.scenario,
+    })
+    
+    return _system_prompt(business_context), _static_prefix(request.scenario) + _DYNAMIC_SUFFIX_TEMPLATE.format_map({
+        "db_config": format_db_config(db_state) if not is_what_if else "",
+        "task_section": task_section,
+        "what_if_section": what_if_section,
+    })
+
+@lru_cache(maxsize=4)
+def _system_prompt(business_context: str) -> str:
+    """Render the system block: instructions, RDS reference and the business context.
+
+    All of it is identical between requests (the business context changes only with a
+    deploy), so Bedrock can serve it from the prompt cache. The instructions alone are
+    ~1.3k tokens - under the 2,048-token minimum cache checkpoint of some Claude models -
+    so the policy docs and incident history go here rather than in the user turn.
+    """
+    return BASE_SYSTEM_PROMPT + RDS_FEATURE_REFERENCE + "\n" + business_context + "\n" + OUTPUT_FORMAT_PROMPT
+
+@lru_cache(maxsize=32)
+def _static_prefix(scenario: str) -> str:
+    """Render the part of the user prompt shared by every request for a scenario.
+
+    Built once per scenario, so the prefix is byte-identical between requests.
+    """
+    return _STATIC_PREFIX_TEMPLATE.format_map({
+        "scenario_prompt": get_scenario(scenario).prompt_section,
+    })
 
 def format_db_config(db_state: DbConfig) -> str:
     """Format DB config for the prompt."""
-    return f"""
-Database: {db_state.identifier}
-Engine: {db_state.engine}
-Instance Class: {db_state.instance_class}
-Multi-AZ: {db_state.multi_az}
-PITR Enabled: {db_state.pitr_enabled}
-Backup Retention: {db_state.backup_retention_days} days
-Read Replicas: {', '.join(db_state.read_replicas) if db_state.read_replicas else 'None'}
-Allocated Storage: {db_state.allocated_storage} GB
-Max Allocated Storage: {db_state.max_allocated_storage} GB
-"""
+    # DbConfig isn't hashable, so cache on the values the template reads
+    read_replicas = db_state.read_replicas
+    fields = (
+        db_state.identifier,
+        db_state.engine,
+        db_state.instance_class,
+        db_state.multi_az,
+        db_state.pitr_enabled,
+        db_state.backup_retention_days,
+        tuple(read_replicas) if isinstance(read_replicas, list) else read_replicas,
+        db_state.allocated_storage,
+        db_state.max_allocated_storage,
+    )
+    try:
+        return _format_db_config_cached(*fields)
+    except TypeError:
+        # What-if overrides are applied without validation, so a field can hold an
+        # unhashable value (e.g. a list); render those uncached, as str() would
+        return _format_db_config_cached.__wrapped__(*fields)
+
+@lru_cache(maxsize=256)
+def _format_db_config_cached(identifier, engine, instance_class, multi_az, pitr_enabled,
+                             backup_retention_days, read_replicas, allocated_storage, max_allocated_storage) -> str:
+    return _DB_CFG_TEMPLATE.format_map({
+        "identifier": identifier,
+        "engine": engine,
+        "instance_class": instance_class,
+        "multi_az": multi_az,
+        "pitr_enabled": pitr_enabled,
+        "backup_retention_days": backup_retention_days,
+        "read_replicas": ', '.join(read_replicas) if read_replicas else 'None',
+        "allocated_storage": allocated_storage,
+        "max_allocated_storage": max_allocated_storage,
+    })
@@ -1,87 +1,303 @@
-import boto3
-from botocore.config import Config
-from botocore.exceptions import ClientError 
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import hashlib
 import logging
+import threading
 import time
 import json
 import os
+from cachetools import TTLCache
+import orjson
 from src.engine.prompt_builder import build_prompt
-from src.engine.aws_state import FAKE_DATABASES, get_fake_db_state, get_real_db_state
+from src.engine.aws_state import AWS_PROFILE, FAKE_DATABASE_IDS, get_fake_db_state, get_real_db_state
 from src.engine.business_context import load_business_context
+from src.engine.cloudwatch_metric import IS_LAMBDA
 from src.engine.models import DbScenarioRequest, DbImpactResponse, DbConfig
 
 logger = logging.getLogger(__name__)
-IS_LAMBDA = os.getenv('AWS_EXECUTION_ENV') is not None
+
+# Analyses keyed by a digest of the model settings and the exact prompt sent to
+# Bedrock. The prompt covers the scenario, DB config, business context and what-if
+# baseline, so identical inputs (dashboard refreshes, CI) skip the Bedrock call.
+_response_cache = TTLCache(maxsize=1024, ttl=3600)
+_response_cache_lock = threading.Lock()
+
+# One client per process so every call (and warm Lambda invocation) reuses its
+# keep-alive connections instead of paying a TLS handshake
+@lru_cache(maxsize=1)
+def _bedrock_client():
+    import boto3
+    from botocore.config import Config
+    config = Config(
+        connect_timeout=5,
+        read_timeout=30,
+        tcp_keepalive=True,
+        # One pooled connection per concurrent batch_analyze worker
+        max_pool_connections=10,
+        retries={'max_attempts': 3, 'mode': 'adaptive'}
+    )
+    return boto3.client('bedrock-runtime', region_name='us-east-1', config=config)
+
+# Optional fleet-wide tier behind _response_cache: a DynamoDB table (pk = hex prompt
+# digest, body = analysis JSON, ttl = expiry in epoch seconds) so a fresh container
+# reuses analyses other containers already paid Bedrock for. Unset = per-process only.
+RESPONSE_CACHE_TABLE = os.getenv('RESPONSE_CACHE_TABLE')
+SHARED_CACHE_TTL_SECONDS = 3600
+
+@lru_cache(maxsize=1)
+def _dynamodb_client():
+    import boto3
+    from botocore.config import Config
+    # A slow cache is worse than none - fail fast and fall through to Bedrock
+    config = Config(
+        connect_timeout=1,
+        read_timeout=2,
+        tcp_keepalive=True,
+        max_pool_connections=10,
+        retries={'max_attempts': 2, 'mode': 'standard'}
+    )
+    return boto3.client('dynamodb', region_name='us-east-1', config=config)
+
+def _shared_cache_get(cache_key: bytes) -> DbImpactResponse | None:
+    try:
+        item = _dynamodb_client().get_item(TableName=RESPONSE_CACHE_TABLE, Key={'pk': {'S': cache_key.hex()}}).get('Item')
+    except Exception as e:
+        logger.warning("Shared response cache read failed: %s", e)
+        return None
+    if not item:
+        return None
+    try:
+        # DynamoDB deletes expired items lazily, so check ttl ourselves
+        if int(item['ttl']['N']) <= time.time():
+            return None
+        return DbImpactResponse.model_validate_json(item['body']['S'])
+    except (KeyError, ValueError) as e:
+        # Malformed or schema-stale row - treat as a miss so Bedrock answers (and overwrites it)
+        logger.warning("Ignoring unreadable shared response cache entry: %s", e)
+        return None
+
+# Off Lambda, writes are fire-and-forget so a slow DynamoDB never delays the response
+_shared_cache_writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix='cache-put')
+
+def _shared_cache_put(cache_key: bytes, parsed: DbImpactResponse):
+    # Serialize now - the caller goes on to set db_config on this same object
+    item = {
+        'pk': {'S': cache_key.hex()},
+        'body': {'S': parsed.model_dump_json()},
+        'ttl': {'N': str(int(time.time()) + SHARED_CACHE_TTL_SECONDS)},
+    }
+    if IS_LAMBDA:
+        # A frozen Lambda sandbox can't be trusted to finish the write later; the
+        # client's 1s/2s timeouts bound what this adds to the request
+        _put_shared_cache_item(item)
+    else:
+        _shared_cache_writer.submit(_put_shared_cache_item, item)
+
+def _put_shared_cache_item(item: dict):
+    try:
+        _dynamodb_client().put_item(TableName=RESPONSE_CACHE_TABLE, Item=item)
+    except Exception as e:
+        logger.warning("Shared response cache write failed: %s", e)
+
+def prewarm():
+    """Build the Bedrock client and load the business context ahead of the first request."""
+    _bedrock_client()
+    load_business_context()
+
 def run_simulation(request: DbScenarioRequest, db_state: DbConfig | None = None, is_what_if: bool = False, baseline_config: DbConfig | None = None) -> DbImpactResponse:
-    start_time = time.time()
-    logger.info(f"Starting simulation for db={request.db_identifier}, scenario={request.scenario}")
+    start_ns = time.perf_counter_ns()
+    logger.info("Starting simulation for db=%s, scenario=%s", request.db_identifier, request.scenario)
+    # Business context is loaded once per process (lru_cache). On that first load, read
+    # it alongside the RDS call below instead of after it - both are just I/O waits
+    context_future = None
+    if db_state is None and request.db_identifier not in FAKE_DATABASE_IDS and not load_business_context.cache_info().currsize:
+        executor = ThreadPoolExecutor(max_workers=1)
+        context_future = executor.submit(load_business_context)
+        executor.shutdown(wait=False)  # the worker exits once the load finishes
     # use fake database if it is in the fake databases list to avoid calling aws and incur costs
-    db_start = time.time()
+    db_start_ns = time.perf_counter_ns()
     if db_state is None:
-        if request.db_identifier in  FAKE_DATABASES:
+        if request.db_identifier in FAKE_DATABASE_IDS:
             db_state = get_fake_db_state(request.db_identifier)
         else:
-            profile=None if IS_LAMBDA else 'develeap-ishay'
-            db_state = get_real_db_state(request.db_identifier, profile_name=profile)
-        logger.info(f"DB state fetch: {(time.time() - db_start) * 1000:.0f}ms")
+            db_state = get_real_db_state(request.db_identifier, profile_name=AWS_PROFILE)
+        logger.info("DB state fetch: %.0fms", (time.perf_counter_ns() - db_start_ns) / 1e6)
+    else:
+        logger.info("Using provided DB state (skipped fetch)")
+    context_start_ns = time.perf_counter_ns()
+    business_context = context_future.result() if context_future else load_business_context()
+    logger.info("Business context fetch: %.0fms", (time.perf_counter_ns() - context_start_ns) / 1e6)
+    system_prompt, prompt = build_prompt(request, db_state, business_context, is_what_if=is_what_if, baseline_config=baseline_config)
+    # The model and output cap are part of the key so a config change doesn't keep
+    # serving analyses from the previous model (the shared tier lives for an hour)
+    cache_key = hashlib.blake2b(
+        f"{BEDROCK_MODEL_ID}\x00{MAX_OUTPUT_TOKENS}\x00{system_prompt}\x00{prompt}".encode(), digest_size=16
+    ).digest()
+    cached = None
+    if not request.bypass_cache:
+        with _response_cache_lock:
+            cached = _response_cache.get(cache_key)
+        if cached is None and RESPONSE_CACHE_TABLE:
+            cached = _shared_cache_get(cache_key)
+            if cached is not None:
+                with _response_cache_lock:
+                    _response_cache[cache_key] = cached
+    if cached is not None:
+        logger.info("Bedrock inference: cache hit")
+        # Copy so callers can't mutate the cached entry
+        parsed = cached.model_copy(deep=True)
+        parsed._from_cache = True
     else:
-        logger.info(f"Using provided DB state (skipped fetch)")
-    context_start = time.time()
-    business_context = load_business_context()
-    logger.info(f"Business context fetch: {(time.time() - context_start) * 1000:.0f}ms")
-    prompt = build_prompt(request, db_state, business_context, is_what_if=is_what_if, baseline_config=baseline_config)
-    bedrock_start = time.time()
-    raw_response = call_bedrock(prompt)
-    logger.info(f"Bedrock inference: {(time.time() - bedrock_start) * 1000:.0f}ms")
-
-    # Extract JSON from response (handle markdown, leading text, etc.)
-    cleaned_response = raw_response.strip()
-
-    # Find the JSON object - look for first { and last }
-    first_brace = cleaned_response.find('{')
-    last_brace = cleaned_response.rfind('}')
-
-    if first_brace != -1 and last_brace != -1:
-        # Extract just the JSON portion
-        cleaned_response = cleaned_response[first_brace:last_brace + 1]
-
-    parsed = DbImpactResponse.model_validate_json(cleaned_response)
+        bedrock_start_ns = time.perf_counter_ns()
+        raw_response = call_bedrock(prompt, system_prompt)
+        logger.info("Bedrock inference: %.0fms", (time.perf_counter_ns() - bedrock_start_ns) / 1e6)
+        parsed = DbImpactResponse.model_validate(_extract_json(raw_response))
+        with _response_cache_lock:
+            _response_cache[cache_key] = parsed.model_copy(deep=True)
+        if RESPONSE_CACHE_TABLE:
+            _shared_cache_put(cache_key, parsed)
     # Include the db_config that was analyzed
     parsed.db_config = db_state
-    total_time = (time.time() - start_time) * 1000
-    logger.info(f"Simulation complete in {total_time:.0f}ms - severity={parsed.business_severity}, sla_violation={parsed.sla_violation}")
+    logger.info("Simulation complete in %.0fms - severity=%s, sla_violation=%s",
+                (time.perf_counter_ns() - start_ns) / 1e6, parsed.business_severity, parsed.sla_violation)
     
     return parsed
 
-def call_bedrock(prompt: str) -> str:
-    """Calls AWS Bedrock to get AI assessment."""
+# The JSON answer is typically 300-600 tokens; the cap bounds worst-case latency on a
+# runaway generation. "\n---\n" is the section divider the prompt itself uses, so it
+# only shows up if the model starts another section after the JSON. (Not ``` - the
+# model often opens its answer with a ```json fence.)
+MAX_OUTPUT_TOKENS = 1000
+STOP_SEQUENCES = ["\n---\n"]
+
+BEDROCK_MODEL_ID = "anthropic.claude-3-5-sonnet-20240620-v1:0"
+# Bedrock rejects cache_control for models without prompt caching, and Claude 3.5 Sonnet
+# (20240620) is one of those - so the system block is only marked for caching when the
+# model is on this list. endswith() also matches cross-region profiles ("us.anthropic...").
+# NOTE: with the BEDROCK_MODEL_ID above, PROMPT_CACHING is False and nothing is cached;
+# switch to a listed model to turn it on.
+_PROMPT_CACHE_MODELS = (
+    "anthropic.claude-3-7-sonnet-20250219-v1:0",
+    "anthropic.claude-3-5-haiku-20241022-v1:0",
+)
+PROMPT_CACHING = BEDROCK_MODEL_ID.endswith(_PROMPT_CACHE_MODELS)
+
+_JSON_DECODER = json.JSONDecoder()
+
+def _extract_json(text: str) -> dict:
+    """Decode the first JSON object in the model output, ignoring markdown or prose around it.
+
+    raw_decode parses in one pass and stops at the object's closing brace, so stray
+    braces in trailing text don't matter.
+    """
+    start = text.find('{')
+    while start != -1:
+        try:
+            obj, _ = _JSON_DECODER.raw_decode(text, start)
+            if isinstance(obj, dict):
+                return obj
+        except ValueError:
+            pass
+        start = text.find('{', start + 1)
+    raise ValueError("No JSON object found in model response")
+
+def _read_stream(stream) -> str:
+    """Collect the streamed answer, stopping once its top-level JSON object is complete.
+
+    If the model keeps writing commentary after the JSON, the stream is closed rather
+    than waiting for text we would discard. Otherwise the remaining metadata events
+    are drained so the pooled connection stays reusable.
+    """
+    parts = []
+    depth = 0
+    in_string = escaped = done = False
+    for event in stream:
+        chunk = event.get('chunk')
+        if not chunk:
+            continue
+        payload = orjson.loads(chunk['bytes'])
+        if payload.get('type') == 'message_start':
+            # Cache counters only appear when caching is on - they're how we see it working
+            usage = payload.get('message', {}).get('usage', {})
+            logger.info("Bedrock input tokens: %s (cache read %s, cache write %s)", usage.get('input_tokens'),
+                        usage.get('cache_read_input_tokens', 0), usage.get('cache_creation_input_tokens', 0))
+            continue
+        if payload.get('type') != 'content_block_delta':
+            if payload.get('type') == 'message_delta' and payload['delta'].get('stop_reason') == 'max_tokens':
+                logger.warning("Bedrock response hit max_tokens (%d) and was cut off", MAX_OUTPUT_TOKENS)
+            continue
+        text = payload['delta'].get('text', '')
+        if done:
+            # A closing ``` fence isn't commentary; anything else is
+            if text.strip(' \n`'):
+                stream.close()
+                break
+            continue
+        parts.append(text)
+        for ch in text:
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == '\\':
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '{':
+                depth += 1
+            elif depth:
+                if ch == '"':
+                    in_string = True
+                elif ch == '}':
+                    depth -= 1
+                    if depth == 0:
+                        # A brace in leading prose can close early; only stop on real JSON
+                        try:
+                            _extract_json(''.join(parts))
+                            done = True
+                        except ValueError:
+                            pass
+                        break
+    return ''.join(parts)
+
+def call_bedrock(prompt: str, system_prompt: str | None = None) -> str:
+    """Calls AWS Bedrock to get AI assessment.
+
+    On models with prompt caching (PROMPT_CACHING), system_prompt is marked for
+    caching, so it should be the part of the prompt that is identical across requests.
+    """
 
     # ===== CLAUDE/ANTHROPIC CODE =====
-    model_id = "anthropic.claude-3-5-sonnet-20240620-v1:0"
-    logger.info(f"Using Bedrock model: {model_id}")
+    model_id = BEDROCK_MODEL_ID
+    logger.info("Using Bedrock model: %s", model_id)
     
-    body = json.dumps({
+    request_body = {
         "anthropic_version": "bedrock-2023-05-31",
-        "max_tokens": 2000,
+        "max_tokens": MAX_OUTPUT_TOKENS,
+        "stop_sequences": STOP_SEQUENCES,
         "messages": [
             {
                 "role": "user",
                 "content": prompt
             }
         ]
-    })
-    config = Config(
-        connect_timeout=5,
-        read_timeout=30   
-    )
-    bedrock = boto3.client('bedrock-runtime', region_name='us-east-1', config=config)
+    }
+    if system_prompt:
+        request_body["system"] = [
+            {
+                "type": "text",
+                "text": system_prompt
+            }
+        ]
+        if PROMPT_CACHING:
+            request_body["system"][0]["cache_control"] = {"type": "ephemeral"}
+    body = orjson.dumps(request_body)
+    from botocore.exceptions import ClientError
     try:
-        response = bedrock.invoke_model(
+        response = _bedrock_client().invoke_model_with_response_stream(
             modelId=model_id,
             body=body
         )
-        response_body = json.loads(response['body'].read())
-        return response_body['content'][0]['text']
+        return _read_stream(response['body'])
     except ClientError as e:
         error_code = e.response['Error']['Code']
         if error_code == 'AccessDenied':
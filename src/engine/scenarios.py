@@ -8,20 +8,35 @@ CRITICAL: All scenario prompts must follow constraints from architecture.md sect
 - Assess DB-level severity, not business operations
 
 Design Pattern:
-- Each scenario is a dict with name, description, prompt_section, required_db_fields, tags
+- Each scenario is a frozen Scenario with name, description, prompt_section, required_db_fields, tags
 - prompt_section is injected into the main prompt by prompt_builder.py
 - required_db_fields lists DB config fields needed for analysis
 """
+from collections.abc import Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
+
+
+@dataclass(frozen=True, slots=True)
+class Scenario:
+    id: str
+    name: str
+    description: str
+    prompt_section: str
+    required_db_fields: tuple[str, ...]
+    tags: tuple[str, ...]
+
 
 # ==============================================================================
 # SCENARIO DEFINITIONS
 # ==============================================================================
 
-SCENARIOS = {
-    "primary_db_failure": {
-        "name": "Primary Database Failure",
-        "description": "Analyzes impact when primary DB instance fails completely (hardware failure, AZ outage, etc.)",
-        "prompt_section": """
+SCENARIOS: Mapping[str, Scenario] = MappingProxyType({
+    "primary_db_failure": Scenario(
+        id="primary_db_failure",
+        name="Primary Database Failure",
+        description="Analyzes impact when primary DB instance fails completely (hardware failure, AZ outage, etc.)",
+        prompt_section="""
 SCENARIO: Primary database instance has failed completely (hardware failure, AZ outage, or critical error).
 
 ANALYSIS REQUIRED:
@@ -70,14 +85,15 @@ RECOMMENDATIONS (prioritize by impact):
 - If backup retention < 7 days AND compliance requirements exist: Increase retention for audit purposes
 - If instance class is small: Consider larger instance for faster backup/restore operations
 """,
-        "required_db_fields": ["multi_az", "pitr_enabled", "backup_retention_days", "instance_class"],
-        "tags": ["availability", "disaster-recovery", "critical"]
-    },
-
-    "replica_lag": {
-        "name": "Read Replica Lag",
-        "description": "Analyzes impact when read replicas experience significant replication lag (>5 minutes behind primary)",
-        "prompt_section": """
+        required_db_fields=("multi_az", "pitr_enabled", "backup_retention_days", "instance_class"),
+        tags=("availability", "disaster-recovery", "critical"),
+    ),
+
+    "replica_lag": Scenario(
+        id="replica_lag",
+        name="Read Replica Lag",
+        description="Analyzes impact when read replicas experience significant replication lag (>5 minutes behind primary)",
+        prompt_section="""
 SCENARIO: Read replicas are experiencing significant replication lag (>5 minutes behind primary database).
 
 ANALYSIS REQUIRED:
@@ -124,14 +140,15 @@ RECOMMENDATIONS:
 - If business requires real-time reads: Implement read-through cache or route critical reads to primary
 - Monitor replication lag metrics and set up alerts at 2-minute threshold
 """,
-        "required_db_fields": ["read_replicas", "instance_class", "engine"],
-        "tags": ["performance", "read-scaling", "data-consistency"]
-    },
-
-    "backup_failure": {
-        "name": "Backup Failure",
-        "description": "Analyzes impact when automated backups fail or latest backup is corrupted/unusable",
-        "prompt_section": """
+        required_db_fields=("read_replicas", "instance_class", "engine"),
+        tags=("performance", "read-scaling", "data-consistency"),
+    ),
+
+    "backup_failure": Scenario(
+        id="backup_failure",
+        name="Backup Failure",
+        description="Analyzes impact when automated backups fail or latest backup is corrupted/unusable",
+        prompt_section="""
 SCENARIO: Automated database backups have failed, or the latest backup is corrupted and unusable.
 
 ANALYSIS REQUIRED:
@@ -190,14 +207,15 @@ RECOMMENDATIONS (prioritize by urgency):
 - Implement backup monitoring and alerting (alert on first failure, not just repeated failures)
 - Test backup restoration regularly (quarterly) to catch corruption early
 """,
-        "required_db_fields": ["backup_retention_days", "pitr_enabled", "multi_az"],
-        "tags": ["disaster-recovery", "compliance", "data-protection", "critical"]
-    },
-
-    "storage_pressure": {
-        "name": "Storage Pressure",
-        "description": "Analyzes impact when database storage utilization reaches 85%+ of allocated capacity",
-        "prompt_section": """
+        required_db_fields=("backup_retention_days", "pitr_enabled", "multi_az"),
+        tags=("disaster-recovery", "compliance", "data-protection", "critical"),
+    ),
+
+    "storage_pressure": Scenario(
+        id="storage_pressure",
+        name="Storage Pressure",
+        description="Analyzes impact when database storage utilization reaches 85%+ of allocated capacity",
+        prompt_section="""
 SCENARIO: Database storage utilization has reached 85%+ of allocated capacity.
 
 ANALYSIS REQUIRED:
@@ -263,30 +281,33 @@ RECOMMENDATIONS (prioritize by urgency):
 
 - If frequent storage pressure: Consider data lifecycle policies or table partitioning
 """,
-        "required_db_fields": ["allocated_storage", "max_allocated_storage", "engine", "instance_class"],
-        "tags": ["capacity", "availability", "operational"]
-    }
-}
+        required_db_fields=("allocated_storage", "max_allocated_storage", "engine", "instance_class"),
+        tags=("capacity", "availability", "operational"),
+    ),
+})
 
 
 # UTILITY FUNCTIONS
 # ==============================================================================
 
+# Built once - the registry is fixed at import. Shared between callers, so don't mutate.
+_SCENARIO_LIST: tuple[dict, ...] = tuple(
+    {
+        'id': scenario_id,
+        'name': scenario.name,
+        'description': scenario.description,
+        'tags': scenario.tags
+    }
+    for scenario_id, scenario in SCENARIOS.items()
+)
+
 #For UI
-def list_scenarios():
-    results = []
-    for scenario_id, scenario in SCENARIOS.items():
-        results.append({
-            'id': scenario_id,
-            'name': scenario['name'],
-            'description': scenario['description'],
-            'tags': scenario['tags']
-        })
-    return results
+def list_scenarios() -> tuple[dict, ...]:
+    return _SCENARIO_LIST
 
 
 #For prompt builder
-def get_scenario(scenario_id: str):
+def get_scenario(scenario_id: str) -> Scenario:
     if scenario_id not in SCENARIOS:
         raise ValueError(f"Scenario {scenario_id} not found")
     return SCENARIOS[scenario_id]
@@ -6,13 +6,14 @@ from src.engine.cloudwatch_metric import emit_analysis_metric
 logger = logging.getLogger(__name__)
 
 def analyze(request: DbScenarioRequest) -> DbImpactResponse:
-    start_time = time.time()
-    logger.info(f"Starting single analysis for db={request.db_identifier}, scenario={request.scenario}")
+    start_ns = time.perf_counter_ns()
+    logger.info("Starting single analysis for db=%s, scenario=%s", request.db_identifier, request.scenario)
     
-    # Run the simulation (no caching - always get fresh results)
+    # Run the simulation (identical prompts are served from run_simulation's cache
+    # unless request.bypass_cache is set)
     response = run_simulation(request)
-    total_time = (time.time() - start_time) * 1000
-    logger.info(f"Single analysis complete in {total_time:.0f}ms - severity={response.business_severity}, sla_violation={response.sla_violation}")
+    total_time = (time.perf_counter_ns() - start_ns) / 1e6
+    logger.info("Single analysis complete in %.0fms - severity=%s, sla_violation=%s", total_time, response.business_severity, response.sla_violation)
     emit_analysis_metric(response, total_time, request.scenario)
     
     return response
@@ -0,0 +1,179 @@
+"""
+Tests for the bulk RDS lookup in aws_state.py (get_real_db_states_bulk).
+The RDS client is replaced with a stub paginator, so nothing is sent to AWS.
+"""
+import sys
+from unittest.mock import patch, MagicMock
+from botocore.exceptions import ClientError
+from src.engine import aws_state
+from src.engine.aws_state import get_real_db_state, get_real_db_states_bulk
+
+
+def _instance(db_identifier):
+    """A describe_db_instances entry with the fields _to_db_config reads."""
+    return {
+        'DBInstanceIdentifier': db_identifier,
+        'DBInstanceClass': 'db.r6g.large',
+        'Engine': 'postgres',
+        'MultiAZ': True,
+        'BackupRetentionPeriod': 7,
+        'AllocatedStorage': 200,
+    }
+
+
+def _client_error(code):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, 'DescribeDBInstances')
+
+
+class StubPaginator:
+    """Answers each paginate() call from `existing`, splitting the matches over two pages."""
+
+    def __init__(self, existing, error=None):
+        self.existing = set(existing)
+        self.error = error
+        self.filter_values = []
+
+    def paginate(self, Filters):
+        values = Filters[0]['Values']
+        self.filter_values.append(list(values))
+        if self.error:
+            raise self.error
+        found = [_instance(db_identifier) for db_identifier in values if db_identifier in self.existing]
+        return [{'DBInstances': found[:1]}, {'DBInstances': found[1:]}]
+
+
+def _stub_rds(paginator):
+    rds = MagicMock()
+    rds.get_paginator.return_value = paginator
+    return patch.object(aws_state, '_rds_client', return_value=rds), rds
+
+
+def test_bulk_chunks_filter_values():
+    """The db-instance-id filter is sent at most 100 values at a time."""
+    print("Testing filter chunking...")
+
+    db_identifiers = [f"db-{i}" for i in range(250)]
+    paginator = StubPaginator(db_identifiers)
+    client_patch, _ = _stub_rds(paginator)
+    with client_patch:
+        states = get_real_db_states_bulk(db_identifiers, region='us-west-2')
+
+    assert [len(values) for values in paginator.filter_values] == [100, 100, 50]
+    assert [v for values in paginator.filter_values for v in values] == db_identifiers, "Every id sent once, in order"
+    assert len(states) == 250
+    assert states['db-249'].identifier == 'db-249' and states['db-249'].multi_az
+
+    print("✅ Filter chunking: PASSED")
+    print(f"   - Calls: {len(paginator.filter_values)}")
+
+
+def test_bulk_drops_invalid_and_unknown_ids():
+    """Malformed ids never reach AWS; duplicates are sent once; ids AWS doesn't return are left out."""
+    print("Testing invalid and unknown ids...")
+
+    paginator = StubPaginator(["orders-db"])
+    client_patch, _ = _stub_rds(paginator)
+    with client_patch:
+        states = get_real_db_states_bulk(["orders-db", "1-starts-with-digit", "under_score", "orders-db", "missing-db"], region='us-west-2')
+
+    assert paginator.filter_values == [["orders-db", "missing-db"]]
+    assert list(states) == ["orders-db"]
+
+    print("✅ Invalid and unknown ids: PASSED")
+
+
+def test_prefetch_skips_fake_databases():
+    """batch_analyzer only asks AWS for ids that aren't local fake databases."""
+    print("Testing fake ids are not looked up...")
+
+    from src.engine import batch_analyzer
+    with patch.object(batch_analyzer, 'get_real_db_states_bulk', return_value={}) as mock_bulk:
+        assert batch_analyzer.prefetch_db_states(["prod-orders-db-01", "prod-users-db"]) == {}
+        assert not mock_bulk.called, "All-fake batches shouldn't call AWS"
+        batch_analyzer.prefetch_db_states(["prod-orders-db-01", "real-db"])
+        assert mock_bulk.call_args.args[0] == ["real-db"]
+
+    print("✅ Fake ids skipped: PASSED")
+
+
+def test_bulk_seeds_single_lookup_cache():
+    """After a bulk fetch, get_real_db_state is served from _db_state_cache without describe calls."""
+    print("Testing _db_state_cache seeding...")
+
+    paginator = StubPaginator(["seeded-db"])
+    client_patch, rds = _stub_rds(paginator)
+    with client_patch:
+        states = get_real_db_states_bulk(["seeded-db"], region='eu-west-1', profile_name=None)
+        single = get_real_db_state("seeded-db", region='eu-west-1', profile_name=None)
+
+    assert not rds.describe_db_instances.called, "Seeded entry should skip describe_db_instances"
+    assert single == states["seeded-db"]
+    # Callers each get a copy, so mutating one can't poison the cache
+    states["seeded-db"].read_replicas.append("mutated")
+    assert get_real_db_state("seeded-db", region='eu-west-1', profile_name=None).read_replicas == []
+
+    print("✅ Cache seeding: PASSED")
+
+
+def test_error_mapping():
+    """AccessDenied becomes PermissionError and a missing instance ValueError; other errors propagate."""
+    print("Testing AWS error mapping...")
+
+    client_patch, _ = _stub_rds(StubPaginator([], error=_client_error('AccessDenied')))
+    with client_patch:
+        try:
+            get_real_db_states_bulk(["locked-db"], region='ap-south-1')
+            raise AssertionError("Expected PermissionError")
+        except PermissionError as e:
+            assert "locked-db" in str(e)
+
+    client_patch, _ = _stub_rds(StubPaginator([], error=_client_error('Throttling')))
+    with client_patch:
+        try:
+            get_real_db_states_bulk(["busy-db"], region='ap-south-1')
+            raise AssertionError("Expected ClientError")
+        except ClientError as e:
+            assert e.response['Error']['Code'] == 'Throttling'
+
+    client_patch, rds = _stub_rds(StubPaginator([]))
+    rds.describe_db_instances.side_effect = _client_error('DBInstanceNotFound')
+    with client_patch:
+        try:
+            get_real_db_state("gone-db", region='ap-south-1')
+            raise AssertionError("Expected ValueError")
+        except ValueError as e:
+            assert "not found" in str(e)
+        rds.describe_db_instances.side_effect = _client_error('AccessDenied')
+        try:
+            get_real_db_state("hidden-db", region='ap-south-1')
+            raise AssertionError("Expected PermissionError")
+        except PermissionError:
+            pass
+
+    print("✅ Error mapping: PASSED")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Bulk RDS Lookup Test")
+    print("=" * 60)
+
+    try:
+        test_bulk_chunks_filter_values()
+        test_bulk_drops_invalid_and_unknown_ids()
+        test_prefetch_skips_fake_databases()
+        test_bulk_seeds_single_lookup_cache()
+        test_error_mapping()
+
+        print("\n" + "=" * 60)
+        print("✅ ALL TESTS PASSED")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ TEST FAILED: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n❌ ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
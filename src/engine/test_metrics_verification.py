@@ -2,10 +2,12 @@
 Test script to verify CloudWatch metrics are being called correctly.
 This mocks the CloudWatch client to verify metrics without actually sending to AWS.
 """
+import io
+import json
 import sys
-from unittest.mock import patch, MagicMock
-from src.engine.models import DbImpactResponse, BatchResponse, WhatIfResponse
-from src.engine.cloudwatch_metric import emit_analysis_metric, emit_batch_metric, emit_what_if_metric
+from unittest.mock import patch
+from src.engine.models import DbImpactResponse, BatchResponse, BatchResultItem, WhatIfResponse
+from src.engine.cloudwatch_metric import emit_analysis_metric, emit_batch_metric, emit_what_if_metric, flush_metrics
 
 def test_analysis_metrics():
     """Test that emit_analysis_metric calls CloudWatch with correct data."""
@@ -24,8 +26,11 @@ def test_analysis_metrics():
     )
     
     # Mock the CloudWatch client
-    with patch('src.engine.cloudwatch_metric.cloudwatch') as mock_cloudwatch:
+    with patch('src.engine.cloudwatch_metric._cloudwatch_client') as mock_client:
+        mock_cloudwatch = mock_client.return_value
         emit_analysis_metric(response, duration_ms=1234.5, scenario="primary_db_failure")
+        emit_analysis_metric(response, duration_ms=1234.5, scenario="primary_db_failure")
+        flush_metrics()  # emits are queued; send them now
         
         # Verify put_metric_data was called
         assert mock_cloudwatch.put_metric_data.called, "put_metric_data should be called"
@@ -38,12 +43,12 @@ def test_analysis_metrics():
         # Verify namespace
         assert namespace == 'DBImpactAgent', f"Expected namespace 'DBImpactAgent', got '{namespace}'"
         
-        # Verify we have 5 metrics
-        assert len(metric_data) == 5, f"Expected 5 metrics, got {len(metric_data)}"
+        # Two analyses aggregate into 4 AnalysisCount datums plus one Values/Counts datum each for duration and the 3 rates
+        assert len(metric_data) == 8, f"Expected 8 metrics, got {len(metric_data)}"
         
-        # Verify AnalysisCount metric
+        # Verify AnalysisCount metric is summed client-side
         analysis_count = next(m for m in metric_data if m['MetricName'] == 'AnalysisCount')
-        assert analysis_count['Value'] == 1
+        assert analysis_count['Value'] == 2
         assert analysis_count['Unit'] == 'Count'
         assert len(analysis_count['Dimensions']) == 2
         assert analysis_count['Dimensions'][0]['Name'] == 'Severity'
@@ -51,25 +56,81 @@ def test_analysis_metrics():
         
         # Verify AnalysisDuration
         duration = next(m for m in metric_data if m['MetricName'] == 'AnalysisDuration')
-        assert duration['Value'] == 1234.5
+        # Sent as Values/Counts rather than a statistic set, so CloudWatch can still compute percentiles
+        assert duration['Values'] == [1234.5] and duration['Counts'] == [2]
         assert duration['Unit'] == 'Milliseconds'
         
         # Verify SLAViolationRate
         sla = next(m for m in metric_data if m['MetricName'] == 'SLAViolationRate')
-        assert sla['Value'] == 1  # True = 1
+        assert sla['Values'] == [1] and sla['Counts'] == [2]  # True = 1, twice
         assert sla['Unit'] == 'None'
         
+    # A cache hit still counts as an analysis but must not record a ~0ms duration
+    cached = response.model_copy()
+    cached._from_cache = True
+    with patch('src.engine.cloudwatch_metric._cloudwatch_client') as mock_client:
+        mock_cloudwatch = mock_client.return_value
+        emit_analysis_metric(cached, duration_ms=0.4, scenario="primary_db_failure")
+        flush_metrics()
+        
+        metric_data = mock_cloudwatch.put_metric_data.call_args.kwargs['MetricData']
+        assert not any(m['MetricName'] == 'AnalysisDuration' for m in metric_data), "Cache hits should not emit AnalysisDuration"
+        assert any(m['MetricName'] == 'AnalysisCount' for m in metric_data)
+        
         print("✅ emit_analysis_metric: PASSED")
         print(f"   - Namespace: {namespace}")
         print(f"   - Metrics sent: {len(metric_data)}")
         print(f"   - AnalysisCount dimensions: {analysis_count['Dimensions']}")
 
 
+def test_duration_percentile_values():
+    """Distinct durations are all sent, split at the 150-values-per-datum limit."""
+    print("Testing AnalysisDuration Values/Counts batching...")
+    
+    response = DbImpactResponse(
+        business_severity="LOW",
+        sla_violation=False,
+        rto_violation=False,
+        rpo_violation=False,
+        expected_outage_time_minutes=5,
+        why=["Test reason"],
+        recommendations=["Test recommendation"],
+        confidence=0.9
+    )
+    
+    with patch('src.engine.cloudwatch_metric._cloudwatch_client') as mock_client:
+        mock_cloudwatch = mock_client.return_value
+        for i in range(200):
+            emit_analysis_metric(response, duration_ms=1000.0 + i, scenario="primary_db_failure")
+        flush_metrics()
+        
+        metric_data = mock_cloudwatch.put_metric_data.call_args.kwargs['MetricData']
+        durations = [m for m in metric_data if m['MetricName'] == 'AnalysisDuration']
+        assert [len(m['Values']) for m in durations] == [150, 50]
+        assert sorted(v for m in durations for v in m['Values']) == [1000.0 + i for i in range(200)]
+        assert all(c == 1 for m in durations for c in m['Counts'])
+        
+        print("✅ AnalysisDuration Values/Counts: PASSED")
+        print(f"   - Datums sent: {len(durations)}")
+
+
 def test_batch_metrics():
     """Test that emit_batch_metric calls CloudWatch with correct data."""
     print("\nTesting emit_batch_metric...")
     
     # Create a mock batch response
+    def analysis(severity, sla, rto, rpo):
+        return DbImpactResponse(
+            business_severity=severity,
+            sla_violation=sla,
+            rto_violation=rto,
+            rpo_violation=rpo,
+            expected_outage_time_minutes=60,
+            why=["Test reason"],
+            recommendations=["Test recommendation"],
+            confidence=0.85
+        )
+    
     batch_response = BatchResponse(
         total_count=3,
         critical_count=1,
@@ -77,14 +138,16 @@ def test_batch_metrics():
         medium_count=1,
         low_count=0,
         results=[
-            {"status": "success", "analysis": {"sla_violation": True, "rto_violation": False, "rpo_violation": True}},
-            {"status": "success", "analysis": {"sla_violation": False, "rto_violation": True, "rpo_violation": False}},
-            {"status": "success", "analysis": {"sla_violation": True, "rto_violation": False, "rpo_violation": False}},
+            BatchResultItem(db_identifier="db-1", status="success", analysis=analysis("CRITICAL", True, False, True)),
+            BatchResultItem(db_identifier="db-2", status="success", analysis=analysis("HIGH", False, True, False)),
+            BatchResultItem(db_identifier="db-3", status="success", analysis=analysis("MEDIUM", True, False, False)),
         ]
     )
     
-    with patch('src.engine.cloudwatch_metric.cloudwatch') as mock_cloudwatch:
+    with patch('src.engine.cloudwatch_metric._cloudwatch_client') as mock_client:
+        mock_cloudwatch = mock_client.return_value
         emit_batch_metric(batch_response, duration_ms=5000.0)
+        flush_metrics()
         
         assert mock_cloudwatch.put_metric_data.called, "put_metric_data should be called"
         
@@ -93,7 +156,9 @@ def test_batch_metrics():
         metric_data = call_args.kwargs['MetricData']
         
         assert namespace == 'DBImpactAgent'
-        assert len(metric_data) == 10, f"Expected 10 metrics, got {len(metric_data)}"
+        # 10 batch metrics minus BatchLowCount, which is zero and therefore skipped
+        assert len(metric_data) == 9, f"Expected 9 metrics, got {len(metric_data)}"
+        assert not any(m['MetricName'] == 'BatchLowCount' for m in metric_data)
         
         # Verify BatchSize
         batch_size = next(m for m in metric_data if m['MetricName'] == 'BatchSize')
@@ -103,6 +168,10 @@ def test_batch_metrics():
         critical = next(m for m in metric_data if m['MetricName'] == 'BatchCriticalCount')
         assert critical['Value'] == 1
         
+        # Verify violation counts are derived from results when not passed in
+        sla_count = next(m for m in metric_data if m['MetricName'] == 'BatchSLAViolationCount')
+        assert sla_count['Value'] == 2
+        
         print("✅ emit_batch_metric: PASSED")
         print(f"   - Metrics sent: {len(metric_data)}")
         print(f"   - BatchSize: {batch_size['Value']}")
@@ -148,8 +217,10 @@ def test_what_if_metrics():
         }
     )
     
-    with patch('src.engine.cloudwatch_metric.cloudwatch') as mock_cloudwatch:
+    with patch('src.engine.cloudwatch_metric._cloudwatch_client') as mock_client:
+        mock_cloudwatch = mock_client.return_value
         emit_what_if_metric(what_if_response, duration_ms=3000.0, scenario="primary_db_failure")
+        flush_metrics()
         
         assert mock_cloudwatch.put_metric_data.called, "put_metric_data should be called"
         
@@ -173,6 +244,47 @@ def test_what_if_metrics():
         print(f"   - SeverityImproved: {severity_improved['Value']}")
 
 
+def test_emf_metrics_in_lambda():
+    """Test that in Lambda the metrics are logged as EMF records instead of sent via PutMetricData."""
+    print("\nTesting EMF output in Lambda...")
+    
+    response = DbImpactResponse(
+        sla_violation=False,
+        rto_violation=False,
+        rpo_violation=False,
+        expected_outage_time_minutes=2,
+        business_severity="LOW",
+        why=["Test"],
+        recommendations=["Test"],
+        confidence=0.9
+    )
+    
+    stdout = io.StringIO()
+    with patch('src.engine.cloudwatch_metric._cloudwatch_client') as mock_client, \
+         patch('src.engine.cloudwatch_metric.IS_LAMBDA', True), \
+         patch('sys.stdout', stdout):
+        emit_analysis_metric(response, duration_ms=50.0, scenario="primary_db_failure")
+    
+    assert not mock_client.called, "PutMetricData should not be used in Lambda"
+    records = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    
+    # One record per dimension set: Severity+Scenario, Severity, Scenario, and none
+    assert len(records) == 4, f"Expected 4 EMF records, got {len(records)}"
+    for record in records:
+        assert record['_aws']['CloudWatchMetrics'][0]['Namespace'] == 'DBImpactAgent'
+    
+    both = next(r for r in records if r['_aws']['CloudWatchMetrics'][0]['Dimensions'] == [['Severity', 'Scenario']])
+    assert both['Severity'] == 'LOW' and both['Scenario'] == 'primary_db_failure'
+    assert both['AnalysisCount'] == 1
+    
+    rollup = next(r for r in records if r['_aws']['CloudWatchMetrics'][0]['Dimensions'] == [[]])
+    assert rollup['AnalysisDuration'] == 50.0
+    assert rollup['SLAViolationRate'] == 0
+    
+    print("✅ EMF output in Lambda: PASSED")
+    print(f"   - Records logged: {len(records)}")
+
+
 if __name__ == '__main__':
     print("=" * 60)
     print("CloudWatch Metrics Verification Test")
@@ -180,8 +292,10 @@ if __name__ == '__main__':
     
     try:
         test_analysis_metrics()
+        test_duration_percentile_values()
         test_batch_metrics()
         test_what_if_metrics()
+        test_emf_metrics_in_lambda()
         
         print("\n" + "=" * 60)
         print("✅ ALL TESTS PASSED - Metrics are being called correctly!")
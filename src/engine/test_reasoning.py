@@ -0,0 +1,336 @@
+"""
+Tests for reasoning.py: reading the streamed Bedrock answer and the response cache.
+Bedrock and DynamoDB are replaced with fakes, so nothing is sent to AWS.
+"""
+import json
+import sys
+import time
+from unittest.mock import patch, MagicMock
+from src.engine import reasoning
+from src.engine.reasoning import _extract_json, _read_stream, run_simulation
+from src.engine.cloudwatch_metric import flush_metrics
+from src.engine.models import BatchRequest, DbImpactResponse, DbScenarioRequest, WhatIfRequest
+
+ANALYSIS = {
+    "sla_violation": True,
+    "rto_violation": True,
+    "rpo_violation": False,
+    "expected_outage_time_minutes": 45,
+    "business_severity": "HIGH",
+    "why": ["Single-AZ instance"],
+    "recommendations": ["Enable Multi-AZ"],
+    "confidence": 0.85
+}
+
+
+class FakeEventStream:
+    """Stands in for the botocore EventStream: yields Bedrock stream events, records close()."""
+
+    def __init__(self, texts, stop_reason="end_turn", usage=None):
+        self.consumed = 0
+        self.closed = False
+        self._events = [{"type": "message_start", "message": {"usage": usage or {"input_tokens": 1200}}}]
+        self._events += [{"type": "content_block_delta", "delta": {"type": "text_delta", "text": text}} for text in texts]
+        self._events += [
+            {"type": "content_block_stop"},
+            {"type": "message_delta", "delta": {"stop_reason": stop_reason}},
+            {"type": "message_stop"},
+        ]
+
+    def __iter__(self):
+        for payload in self._events:
+            if self.closed:
+                return
+            self.consumed += 1
+            yield {"chunk": {"bytes": json.dumps(payload).encode()}}
+
+    def close(self):
+        self.closed = True
+
+
+def _chunks(text, size=5):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_braces_in_leading_prose():
+    """A brace pair in prose before the JSON must not end the stream early."""
+    print("Testing braces in prose before the JSON...")
+
+    text = "Looking at {the config} and {policy} first.\n" + json.dumps(ANALYSIS)
+    stream = FakeEventStream(_chunks(text) + ["\n\nThe main risk is {x}."])
+    result = _read_stream(stream)
+
+    assert _extract_json(result) == ANALYSIS
+    assert "main risk" not in result, "Commentary after the JSON should not be collected"
+
+    print("✅ Braces in leading prose: PASSED")
+
+
+def test_json_fence():
+    """A ```json fence around the answer is read to the end, not treated as commentary."""
+    print("Testing ```json fenced answer...")
+
+    text = "```json\n" + json.dumps(ANALYSIS, indent=2) + "\n"
+    stream = FakeEventStream(_chunks(text, 7) + ["```"])
+    result = _read_stream(stream)
+
+    assert _extract_json(result) == ANALYSIS
+    assert not stream.closed, "A closing fence should not close the stream"
+    assert stream.consumed == len(stream._events), "Remaining events should be drained"
+
+    print("✅ ```json fence: PASSED")
+
+
+def test_escaped_quotes_and_braces_in_strings():
+    """Quotes, backslashes and braces inside string values don't move the depth count."""
+    print("Testing escaped quotes and braces inside strings...")
+
+    analysis = dict(ANALYSIS, why=['Error "}" in log {', 'path C:\\\\data\\\\', 'nested {"a": 1}'])
+    text = json.dumps(analysis)
+    # Split every 3 chars so escapes land across chunk boundaries
+    stream = FakeEventStream(_chunks(text, 3) + [" Done."])
+    result = _read_stream(stream)
+
+    assert _extract_json(result) == analysis
+    assert result == text
+
+    print("✅ Escaped quotes and braces: PASSED")
+
+
+def test_stops_after_object():
+    """Once the top-level object is complete, trailing commentary closes the stream."""
+    print("Testing early close after the JSON object...")
+
+    stream = FakeEventStream([json.dumps(ANALYSIS), "\n\nLet me explain", " each field..."])
+    result = _read_stream(stream)
+
+    assert result == json.dumps(ANALYSIS)
+    assert stream.closed, "Stream should be closed once commentary starts"
+    # message_start + the JSON delta + the first commentary delta
+    assert stream.consumed == 3, f"Expected 3 events read, got {stream.consumed}"
+
+    print("✅ Stop after object: PASSED")
+    print(f"   - Events read: {stream.consumed} of {len(stream._events)}")
+
+
+def test_truncated_at_max_tokens():
+    """A response cut off by max_tokens is logged and fails to parse rather than returning a partial object."""
+    print("Testing truncation at max_tokens...")
+
+    text = json.dumps(ANALYSIS)[:60]
+    stream = FakeEventStream(_chunks(text), stop_reason="max_tokens")
+    with patch.object(reasoning, "logger") as mock_logger:
+        result = _read_stream(stream)
+
+    assert result == text
+    assert not stream.closed
+    assert mock_logger.warning.called, "max_tokens stop should be logged"
+    try:
+        _extract_json(result)
+        raise AssertionError("Truncated JSON should not parse")
+    except ValueError:
+        pass
+
+    print("✅ Truncation at max_tokens: PASSED")
+
+
+def test_extract_json_skips_prose_braces():
+    """_extract_json returns the first brace-delimited span that decodes to an object."""
+    print("Testing _extract_json...")
+
+    assert _extract_json("Result {not json} then " + json.dumps(ANALYSIS) + " {trailing}") == ANALYSIS
+    try:
+        _extract_json("no object here")
+        raise AssertionError("Expected ValueError")
+    except ValueError:
+        pass
+
+    print("✅ _extract_json: PASSED")
+
+
+FAKE_DB = "prod-orders-db-01"
+
+
+class FakeDynamoDB:
+    """Minimal get_item/put_item over a dict, keyed by pk."""
+
+    def __init__(self):
+        self.items = {}
+        self.gets = 0
+
+    def get_item(self, TableName, Key):
+        self.gets += 1
+        item = self.items.get(Key['pk']['S'])
+        return {'Item': item} if item else {}
+
+    def put_item(self, TableName, Item):
+        self.items[Item['pk']['S']] = Item
+
+
+def _mock_bedrock():
+    """Patch the Bedrock client (a fresh stream per call) and the business context."""
+    bedrock = MagicMock()
+    bedrock.invoke_model_with_response_stream.side_effect = lambda **kwargs: {'body': FakeEventStream([json.dumps(ANALYSIS)])}
+    return (
+        patch.object(reasoning, '_bedrock_client', return_value=bedrock),
+        patch.object(reasoning, 'load_business_context', return_value="Test business context"),
+        bedrock,
+    )
+
+
+def test_response_cache_hit_and_miss():
+    """The second identical request is served from memory; bypass_cache forces a new call."""
+    print("Testing in-process response cache...")
+
+    reasoning._response_cache.clear()
+    client_patch, context_patch, bedrock = _mock_bedrock()
+    with client_patch, context_patch:
+        first = run_simulation(DbScenarioRequest(db_identifier=FAKE_DB))
+        second = run_simulation(DbScenarioRequest(db_identifier=FAKE_DB))
+        assert bedrock.invoke_model_with_response_stream.call_count == 1, "Second request should be a cache hit"
+        assert not first.from_cache and second.from_cache
+        assert second.db_config is not None and second.db_config.identifier == FAKE_DB
+        assert "_from_cache" not in second.model_dump(), "The hit flag must stay out of API responses"
+
+        bypassed = run_simulation(DbScenarioRequest(db_identifier=FAKE_DB, bypass_cache=True))
+        assert bedrock.invoke_model_with_response_stream.call_count == 2, "bypass_cache should call Bedrock"
+        assert not bypassed.from_cache
+
+        run_simulation(DbScenarioRequest(db_identifier=FAKE_DB, scenario="storage_pressure"))
+        assert bedrock.invoke_model_with_response_stream.call_count == 3, "A different prompt is a miss"
+
+    print("✅ Response cache hit/miss: PASSED")
+
+
+def test_response_cache_isolation():
+    """Callers get their own copy; mutating one can't change what later hits return."""
+    print("Testing cached entry isolation...")
+
+    reasoning._response_cache.clear()
+    client_patch, context_patch, bedrock = _mock_bedrock()
+    with client_patch, context_patch:
+        first = run_simulation(DbScenarioRequest(db_identifier=FAKE_DB))
+        first.why.append("mutated by caller")
+        first.db_config = None
+        second = run_simulation(DbScenarioRequest(db_identifier=FAKE_DB))
+        second.recommendations.clear()
+        third = run_simulation(DbScenarioRequest(db_identifier=FAKE_DB))
+
+    assert second.why == ANALYSIS["why"], f"Cached entry was mutated: {second.why}"
+    assert third.recommendations == ANALYSIS["recommendations"]
+    assert third.db_config is not None
+    assert second is not third
+
+    print("✅ Cached entry isolation: PASSED")
+
+
+def test_bypass_cache_forwarded():
+    """Batch and what-if pass bypass_cache on to every simulation they run."""
+    print("Testing bypass_cache forwarding...")
+
+    from src.engine import batch_analyzer, what_if
+    seen = []
+
+    def fake_run_simulation(request, db_state=None, **kwargs):
+        seen.append(request.bypass_cache)
+        return DbImpactResponse(**ANALYSIS)
+
+    with patch.object(batch_analyzer, 'run_simulation', fake_run_simulation), \
+            patch('src.engine.cloudwatch_metric._cloudwatch_client'):
+        batch_analyzer.batch_analyze(BatchRequest(db_identifiers=[FAKE_DB, "prod-users-db"], bypass_cache=True))
+        assert seen == [True, True], f"Batch should forward bypass_cache, got {seen}"
+        seen.clear()
+        batch_analyzer.batch_analyze(BatchRequest(db_identifiers=[FAKE_DB]))
+        assert seen == [False]
+        flush_metrics()
+
+    seen.clear()
+    with patch.object(what_if, 'run_simulation', fake_run_simulation), \
+            patch('src.engine.cloudwatch_metric._cloudwatch_client'):
+        what_if.what_if_analysis(WhatIfRequest(db_identifier=FAKE_DB, config_overrides={"multi_az": True}, bypass_cache=True))
+        assert seen == [True, True], f"What-if should forward bypass_cache to both runs, got {seen}"
+        flush_metrics()  # send the queued metrics to the mock, not AWS at exit
+
+    print("✅ bypass_cache forwarding: PASSED")
+
+
+def test_shared_cache_tier():
+    """With RESPONSE_CACHE_TABLE set, a fresh process reuses analyses stored in DynamoDB."""
+    print("Testing DynamoDB shared response cache...")
+
+    dynamodb = FakeDynamoDB()
+    client_patch, context_patch, bedrock = _mock_bedrock()
+    with client_patch, context_patch, \
+            patch.object(reasoning, 'RESPONSE_CACHE_TABLE', 'response-cache'), \
+            patch.object(reasoning, 'IS_LAMBDA', True), \
+            patch.object(reasoning, '_dynamodb_client', return_value=dynamodb):
+        reasoning._response_cache.clear()
+        run_simulation(DbScenarioRequest(db_identifier=FAKE_DB))
+        assert len(dynamodb.items) == 1, "A miss should write the analysis to DynamoDB"
+        item = next(iter(dynamodb.items.values()))
+        assert json.loads(item['body']['S'])['db_config'] is None, "db_config is per-request and must not be stored"
+        assert int(item['ttl']['N']) > time.time()
+
+        # A new container: empty memory cache, same table
+        reasoning._response_cache.clear()
+        shared_hit = run_simulation(DbScenarioRequest(db_identifier=FAKE_DB))
+        assert bedrock.invoke_model_with_response_stream.call_count == 1, "Should be served from DynamoDB"
+        assert shared_hit.from_cache and shared_hit.db_config is not None
+
+        # The shared hit seeds the memory cache, so the next request doesn't read DynamoDB
+        gets = dynamodb.gets
+        run_simulation(DbScenarioRequest(db_identifier=FAKE_DB))
+        assert dynamodb.gets == gets
+
+        # Expired, unreadable and failing reads all fall through to Bedrock
+        calls = 1
+        for broken in ({**item, 'ttl': {'N': '1'}}, {**item, 'body': {'S': 'not json'}}, {'pk': item['pk']}):
+            dynamodb.items[item['pk']['S']] = broken
+            reasoning._response_cache.clear()
+            result = run_simulation(DbScenarioRequest(db_identifier=FAKE_DB))
+            calls += 1
+            assert bedrock.invoke_model_with_response_stream.call_count == calls, f"{broken} should be a miss"
+            assert not result.from_cache
+        dynamodb.get_item = MagicMock(side_effect=RuntimeError("DynamoDB unavailable"))
+        reasoning._response_cache.clear()
+        run_simulation(DbScenarioRequest(db_identifier=FAKE_DB))
+        assert bedrock.invoke_model_with_response_stream.call_count == calls + 1
+
+        # bypass_cache skips the shared read as well
+        dynamodb.get_item = MagicMock(return_value={})
+        run_simulation(DbScenarioRequest(db_identifier=FAKE_DB, bypass_cache=True))
+        assert not dynamodb.get_item.called
+
+    reasoning._response_cache.clear()
+    print("✅ DynamoDB shared cache: PASSED")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Reasoning Stream and Response Cache Test")
+    print("=" * 60)
+
+    try:
+        test_braces_in_leading_prose()
+        test_json_fence()
+        test_escaped_quotes_and_braces_in_strings()
+        test_stops_after_object()
+        test_truncated_at_max_tokens()
+        test_extract_json_skips_prose_braces()
+        test_response_cache_hit_and_miss()
+        test_response_cache_isolation()
+        test_bypass_cache_forwarded()
+        test_shared_cache_tier()
+
+        print("\n" + "=" * 60)
+        print("✅ ALL TESTS PASSED")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ TEST FAILED: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n❌ ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
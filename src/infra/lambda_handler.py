@@ -1,144 +1,217 @@
-import json
+import hmac
 import logging
 import os
+
+import orjson
+from cachetools import LRUCache
+
 from src.engine.models import DbScenarioRequest, BatchRequest, WhatIfRequest
 from src.engine.single_analyzer import analyze
 from src.engine.batch_analyzer import batch_analyze
-from src.engine.what_if import what_if_analysis
+from src.engine.reasoning import prewarm
 
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+# With Lambda's advanced logging controls the runtime sets the root level from
+# AWS_LAMBDA_LOG_LEVEL; don't override it
+if "AWS_LAMBDA_LOG_LEVEL" not in os.environ:
+    logger.setLevel(logging.INFO)
+
+# Under SnapStart the runtime snapshots the initialized module, so anything done here
+# is restored rather than repeated on each cold start. The in-process caches are still
+# empty at snapshot time; only clients and the static policy docs get captured.
+try:
+    from snapshot_restore_py import register_before_snapshot
+except ImportError:  # local runs and runtimes without SnapStart
+    pass
+else:
+    @register_before_snapshot
+    def _before_snapshot():
+        try:
+            prewarm()
+        except Exception as e:
+            # Not fatal - the first request loads whatever is missing
+            logger.warning("Pre-snapshot warm-up failed: %s", e)
+
+# Lambda env vars are fixed for the life of the container, so read and encode once
+_EXPECTED_API_KEY = os.getenv("API_KEY", "").encode("utf-8")
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Opt-in memo of validated requests keyed by the raw body, for callers that resend
+# identical payloads (dashboards polling a batch). Off by default: a hit hands back
+# the same request object, so it relies on nothing downstream mutating requests.
+_parse_cache = LRUCache(maxsize=64) if os.getenv("ENABLE_PARSE_CACHE") == "true" else None
+
+
+def _dumps(obj) -> str:
+    # API Gateway wants a str body; orjson hands back bytes
+    return orjson.dumps(obj).decode()
+
+
+def _validate(model, body, body_str: str):
+    if _parse_cache is None:
+        return model.model_validate(body)
+    key = (model, body_str)
+    req = _parse_cache.get(key)
+    if req is None:
+        req = _parse_cache[key] = model.model_validate(body)
+    return req
+
+
+def _do_whatif(body, body_str: str) -> dict:
+    # Imported on first use: most containers only ever serve single/batch analyses
+    from src.engine.what_if import what_if_analysis
+    req = _validate(WhatIfRequest, body, body_str)
+    logger.info("What-if analysis for db=%s, scenario=%s, overrides=%s", req.db_identifier, req.scenario, req.config_overrides)
+    what_if_response = what_if_analysis(req)
+    return {
+        "statusCode": 200,
+        "headers": _JSON_HEADERS,
+        "body": what_if_response.model_dump_json()
+    }
+
+
+def _do_batch(body, body_str: str) -> dict:
+    req = _validate(BatchRequest, body, body_str)
+    logger.info("Batch analysis for %d databases, scenario=%s", len(req.db_identifiers), req.scenario)
+    response = batch_analyze(req)
+    return {
+        "statusCode": 200,
+        "headers": _JSON_HEADERS,
+        "body": response.model_dump_json()
+    }
+
+
+def _do_single(body, body_str: str) -> dict:
+    req = _validate(DbScenarioRequest, body, body_str)
+    logger.info("Single analysis for db=%s, scenario=%s", req.db_identifier, req.scenario)
+
+    response = analyze(req)
+
+    logger.info("Analysis complete - Severity: %s, SLA violation: %s", response.business_severity, response.sla_violation)
+    return {
+        "statusCode": 200,
+        "headers": _JSON_HEADERS,
+        "body": response.model_dump_json()
+    }
+
+
+# Keyed by the last path segment, so stage-prefixed paths (/prod/what-if) match too
+_PATH_ROUTES = {
+    "what-if": _do_whatif,
+    "batch-analyze": _do_batch,
+}
+
+# When the path doesn't name a route, detect the request type by body structure.
+# What-if requests have 'config_overrides'; batch requests have 'db_identifiers'
+# (plural), single have 'db_identifier' (singular). Checked in this order.
+_BODY_ROUTES = (
+    ("config_overrides", dict, _do_whatif),
+    ("db_identifiers", list, _do_batch),
+    ("db_identifier", object, _do_single),
+)
+
+
+def _http_method(request_context: dict) -> str:
+    # Only reported in debug output, so not resolved on the routing path
+    return request_context.get("http", {}).get("method", request_context.get("httpMethod", "UNKNOWN"))
+
+
+def _resolve_route(normalized_path: str, body):
+    route = _PATH_ROUTES.get(normalized_path.rpartition("/")[2])
+    if route is None and isinstance(body, dict):
+        route = next((fn for key, kind, fn in _BODY_ROUTES if key in body and isinstance(body[key], kind)), None)
+    if route is None and normalized_path == "/":
+        route = _do_single
+    return route
+
+
+# Keep-warm invocations from the scheduled rule ({"rawPath": "/ping"}). They carry no
+# API key and return before auth, parsing and logging - nothing here touches AWS
+_PING_PATH = "/ping"
+_PING_RESPONSE = {"statusCode": 200, "headers": _JSON_HEADERS, "body": '{"ok":true}'}
+
+# Fixed-content error responses, built once
+_NO_API_KEY_RESPONSE = {"statusCode": 500, "headers": _JSON_HEADERS, "body": '{"error":"API key not set"}'}
+_UNAUTHORIZED_RESPONSE = {"statusCode": 401, "headers": _JSON_HEADERS, "body": '{"error":"Unauthorized"}'}
 
 
 def handler(event, context):
-    logger.info(f"Received request for database simulation")
-    expected_api_key = os.getenv("API_KEY")
-    provided_api_key = event.get("headers", {}).get("x-api-key")
-    if not expected_api_key:
+    if event.get("rawPath") == _PING_PATH:
+        return _PING_RESPONSE
+    logger.info("Received request for database simulation")
+    provided_api_key = event.get("headers", {}).get("x-api-key") or ""
+    if not _EXPECTED_API_KEY:
         logger.error("API key not set")
-        return {
-            "statusCode": 500,
-            "headers": {"Content-Type": "application/json"},
-            "body": json.dumps({"error": "API key not set"})
-        }
-    if provided_api_key != expected_api_key:
-        return {
-            "statusCode": 401,
-            "headers": {"Content-Type": "application/json"},
-            "body": json.dumps({"error": "Unauthorized"})
-        }
+        return _NO_API_KEY_RESPONSE
+    if not hmac.compare_digest(provided_api_key.encode("utf-8"), _EXPECTED_API_KEY):
+        return _UNAUTHORIZED_RESPONSE
+    request_context = event.get("requestContext") or {}
+    # Use resourcePath from requestContext (API Gateway HTTP API v2 provides this)
+    # Fallback to rawPath if resourcePath not available
+    path = request_context.get("resourcePath", event.get("rawPath", "/"))
+    route_key = request_context.get("routeKey", "UNKNOWN")
+    body = None  # parsed once; the 400 branch reports its keys
     try:
-        request_context = event.get("requestContext", {})
-        # Use resourcePath from requestContext (API Gateway HTTP API v2 provides this)
-        # Fallback to rawPath if resourcePath not available
-        path = request_context.get("resourcePath", event.get("rawPath", "/"))
-        route_key = request_context.get("routeKey", "UNKNOWN")
-        http_method = request_context.get("http", {}).get("method", request_context.get("httpMethod", "UNKNOWN"))
-        
         body_str = event.get("body", "{}")
-        body = json.loads(body_str)
-        
-        # Log ALL path-related info for debugging
-        logger.info(f"=== PATH DEBUG INFO ===")
-        logger.info(f"resourcePath: {path}")
-        logger.info(f"routeKey: {route_key}")
-        logger.info(f"httpMethod: {http_method}")
-        logger.info(f"requestContext: {json.dumps(request_context)}")
-        logger.info(f"Body keys: {list(body.keys()) if isinstance(body, dict) else 'not a dict'}")
-        logger.info(f"========================")
+        body = orjson.loads(body_str)
         
         # Normalize path - remove leading/trailing slashes for comparison
         normalized_path = path.rstrip("/") or "/"
-        logger.info(f"Normalized path: {normalized_path}")
-        
-        # Detect batch request by body structure (most reliable)
-        # Batch requests have 'db_identifiers' (plural), single have 'db_identifier' (singular)
-        is_batch_by_body = "db_identifiers" in body and isinstance(body.get("db_identifiers"), list)
-        is_single_by_body = "db_identifier" in body and not is_batch_by_body
-        
-        # Detect what-if request by body structure (has 'config_overrides')
-        is_whatif_by_body = "config_overrides" in body and isinstance(body.get("config_overrides"), dict)
-        
-        # Check for batch-analyze route (path-based OR body-based detection)
-        is_batch_path = normalized_path == "/batch-analyze" or normalized_path.endswith("/batch-analyze")
-        
-        # Check for what-if route (path-based OR body-based detection)
-        is_whatif_path = normalized_path == "/what-if" or normalized_path.endswith("/what-if")
+
+        # Path-related info for debugging routing; serializing requestContext isn't
+        # free, so only do it when DEBUG logging is on
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("=== PATH DEBUG INFO ===")
+            logger.debug("resourcePath: %s", path)
+            logger.debug("routeKey: %s", route_key)
+            logger.debug("httpMethod: %s", _http_method(request_context))
+            logger.debug("requestContext: %s", _dumps(request_context))
+            logger.debug("Body keys: %s", list(body.keys()) if isinstance(body, dict) else 'not a dict')
+            logger.debug("Normalized path: %s", normalized_path)
+            logger.debug("========================")
         
-        if is_whatif_path or is_whatif_by_body:
-            # What-if analysis route
-            req = WhatIfRequest(**body)
-            logger.info(f"What-if analysis for db={req.db_identifier}, scenario={req.scenario}, overrides={req.config_overrides}")
-            what_if_response = what_if_analysis(req)
-            return {
-                "statusCode": 200,
-                "headers": {"Content-Type": "application/json"},
-                "body": what_if_response.model_dump_json()
-            }
-        elif is_batch_path or is_batch_by_body:
-            # Batch analysis route
-            req = BatchRequest(**body)
-            logger.info(f"Batch analysis for {len(req.db_identifiers)} databases, scenario={req.scenario}")
-            response = batch_analyze(req)
-            return {
-                "statusCode": 200,
-                "headers": {"Content-Type": "application/json"},
-                "body": response.model_dump_json()
-            }
-        elif normalized_path == "/" or is_single_by_body:
-            # Single analysis route
-            req = DbScenarioRequest(**body)
-            logger.info(f"Single analysis for db={req.db_identifier}, scenario={req.scenario}")
-            
-            response = analyze(req)
-            
-            logger.info(f"Analysis complete - Severity: {response.business_severity}, SLA violation: {response.sla_violation}")
-            return {
-                "statusCode": 200,
-                "headers": {"Content-Type": "application/json"},
-                "body": response.model_dump_json()
-            }
-        else:
-            # Unknown route - include debug info in response
-            debug_info = {
-                "error": f"Unknown path: {path}",
-                "debug": {
-                    "resourcePath": path,
-                    "normalizedPath": normalized_path,
-                    "routeKey": route_key,
-                    "httpMethod": http_method,
-                    "bodyKeys": list(body.keys()) if isinstance(body, dict) else "not a dict"
-                }
-            }
-            logger.error(f"Unknown route - {json.dumps(debug_info)}")
-            return {
-                "statusCode": 404,
-                "headers": {"Content-Type": "application/json"},
-                "body": json.dumps(debug_info)
+        route = _resolve_route(normalized_path, body)
+        if route is not None:
+            return route(body, body_str)
+
+        # Unknown route - include debug info in response
+        debug_info = {
+            "error": f"Unknown path: {path}",
+            "debug": {
+                "resourcePath": path,
+                "normalizedPath": normalized_path,
+                "routeKey": route_key,
+                "httpMethod": _http_method(request_context),
+                "bodyKeys": list(body.keys()) if isinstance(body, dict) else "not a dict"
             }
+        }
+        logger.error("Unknown route - %s", _dumps(debug_info))
+        return {
+            "statusCode": 404,
+            "headers": _JSON_HEADERS,
+            "body": _dumps(debug_info)
+        }
     except ValueError as e:
         # Include path debug info in validation errors to help diagnose routing issues
-        request_context = event.get("requestContext", {})
-        path = request_context.get("resourcePath", event.get("rawPath", "/"))
-        route_key = request_context.get("routeKey", "UNKNOWN")
         error_response = {
             "error": str(e),
             "debug": {
                 "resourcePath": path,
                 "routeKey": route_key,
-                "bodyKeys": list(json.loads(event.get("body", "{}")).keys()) if event.get("body") else "no body"
+                "bodyKeys": list(body.keys()) if isinstance(body, dict) else "not a dict" if body is not None else "no body"
             }
         }
-        logger.error(f"Validation error - {json.dumps(error_response)}")
+        logger.error("Validation error - %s", _dumps(error_response))
         return {
             "statusCode": 400,
-            "headers": {"Content-Type": "application/json"},
-            "body": json.dumps(error_response)
+            "headers": _JSON_HEADERS,
+            "body": _dumps(error_response)
         }
     except Exception as e:
-        logger.error(f"Error processing request: {str(e)}", exc_info=True)
+        logger.error("Error processing request: %s", e, exc_info=True)
         return {
             "statusCode": 500,
-            "headers": {"Content-Type": "application/json"},
-            "body": json.dumps({"error": str(e)})
+            "headers": _JSON_HEADERS,
+            "body": _dumps({"error": str(e)})
         }
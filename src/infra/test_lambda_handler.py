@@ -0,0 +1,183 @@
+"""
+Tests for request routing and auth in lambda_handler.py.
+The analysis engines are mocked, so only the handler's own logic runs.
+"""
+import json
+import sys
+from unittest.mock import patch, MagicMock
+from src.infra import lambda_handler
+from src.infra.lambda_handler import handler
+
+API_KEY = "test-api-key"
+
+
+def _event(body, path="/", api_key=API_KEY, raw=False):
+    """An API Gateway HTTP API (v2) event as the handler receives it."""
+    return {
+        "rawPath": path,
+        "headers": {"x-api-key": api_key} if api_key is not None else {},
+        "requestContext": {"resourcePath": path, "routeKey": f"POST {path}", "http": {"method": "POST"}},
+        "body": body if raw else json.dumps(body),
+    }
+
+
+class MockEngines:
+    """Patches the three engines the routes call; each returns a body naming itself."""
+
+    def __init__(self):
+        self.single = MagicMock(name="analyze")
+        self.batch = MagicMock(name="batch_analyze")
+        self.what_if = MagicMock(name="what_if_analysis")
+        for name, mock in (("single", self.single), ("batch", self.batch), ("what_if", self.what_if)):
+            mock.return_value.model_dump_json.return_value = json.dumps({"route": name})
+        self._patches = [
+            patch.object(lambda_handler, "_EXPECTED_API_KEY", API_KEY.encode("utf-8")),
+            patch.object(lambda_handler, "analyze", self.single),
+            patch.object(lambda_handler, "batch_analyze", self.batch),
+            patch("src.engine.what_if.what_if_analysis", self.what_if),
+        ]
+
+    def __enter__(self):
+        for p in self._patches:
+            p.start()
+        return self
+
+    def __exit__(self, *exc):
+        for p in reversed(self._patches):
+            p.stop()
+
+    def route_of(self, event) -> str:
+        response = handler(event, None)
+        assert response["statusCode"] == 200, f"Expected 200, got {response['statusCode']}: {response['body']}"
+        return json.loads(response["body"])["route"]
+
+
+SINGLE_BODY = {"db_identifier": "orders-db", "scenario": "primary_db_failure"}
+BATCH_BODY = {"db_identifiers": ["orders-db", "users-db"], "scenario": "primary_db_failure"}
+WHAT_IF_BODY = {"db_identifier": "orders-db", "scenario": "primary_db_failure", "config_overrides": {"multi_az": True}}
+
+
+def test_body_routes():
+    """Without a route in the path, the body shape picks the analysis."""
+    print("Testing body-based routing...")
+
+    with MockEngines() as engines:
+        assert engines.route_of(_event(SINGLE_BODY)) == "single"
+        assert engines.route_of(_event(BATCH_BODY)) == "batch"
+        assert engines.route_of(_event(WHAT_IF_BODY)) == "what_if"
+        # Any path that isn't a route name falls back to the body too
+        assert engines.route_of(_event(BATCH_BODY, path="/analyze")) == "batch"
+
+        req = engines.what_if.call_args.args[0]
+        assert req.config_overrides == {"multi_az": True}
+
+    print("✅ Body-based routing: PASSED")
+
+
+def test_path_route_beats_body():
+    """A route named in the path wins over what the body looks like."""
+    print("Testing path vs body precedence...")
+
+    with MockEngines() as engines:
+        # Has config_overrides, which alone would route to what-if
+        body = dict(BATCH_BODY, config_overrides={"multi_az": True})
+        assert lambda_handler._resolve_route("/", body) is lambda_handler._do_whatif
+        assert engines.route_of(_event(body, path="/batch-analyze")) == "batch"
+        assert engines.route_of(_event(WHAT_IF_BODY, path="/what-if")) == "what_if"
+        assert not engines.single.called
+
+    print("✅ Path vs body precedence: PASSED")
+
+
+def test_stage_prefixed_paths():
+    """/prod/what-if and /prod/batch-analyze/ resolve like the bare routes."""
+    print("Testing stage-prefixed paths...")
+
+    with MockEngines() as engines:
+        assert engines.route_of(_event(WHAT_IF_BODY, path="/prod/what-if")) == "what_if"
+        assert engines.route_of(_event(BATCH_BODY, path="/prod/batch-analyze/")) == "batch"
+        assert engines.route_of(_event(SINGLE_BODY, path="/prod/")) == "single"
+
+    print("✅ Stage-prefixed paths: PASSED")
+
+
+def test_unknown_route_404():
+    """A body that matches no route on a non-root path is a 404 with routing debug info."""
+    print("Testing unknown route...")
+
+    with MockEngines() as engines:
+        response = handler(_event({"foo": 1}, path="/nope"), None)
+        assert response["statusCode"] == 404
+        body = json.loads(response["body"])
+        assert body["error"] == "Unknown path: /nope"
+        assert body["debug"]["bodyKeys"] == ["foo"]
+        assert body["debug"]["normalizedPath"] == "/nope"
+        assert not (engines.single.called or engines.batch.called or engines.what_if.called)
+
+    print("✅ Unknown route 404: PASSED")
+
+
+def test_bad_requests_400():
+    """Invalid JSON and failed validation are 400s that report the body keys."""
+    print("Testing 400 responses...")
+
+    with MockEngines() as engines:
+        response = handler(_event("{not json", raw=True), None)
+        assert response["statusCode"] == 400
+        assert json.loads(response["body"])["debug"]["bodyKeys"] == "no body"
+
+        response = handler(_event({"db_identifier": "1-bad-id", "scenario": "primary_db_failure"}), None)
+        assert response["statusCode"] == 400
+        body = json.loads(response["body"])
+        assert "db_identifier must be valid AWS RDS identifier" in body["error"]
+        assert body["debug"]["bodyKeys"] == ["db_identifier", "scenario"]
+        assert not engines.single.called
+
+    print("✅ 400 responses: PASSED")
+
+
+def test_ping_and_auth():
+    """/ping is answered before auth; every other route needs the API key."""
+    print("Testing /ping and API key checks...")
+
+    with MockEngines() as engines:
+        response = handler({"rawPath": "/ping"}, None)
+        assert response["statusCode"] == 200 and json.loads(response["body"]) == {"ok": True}
+
+        assert handler(_event(SINGLE_BODY, api_key=None), None)["statusCode"] == 401
+        assert handler(_event(SINGLE_BODY, api_key="wrong-key"), None)["statusCode"] == 401
+        assert handler(_event(BATCH_BODY, path="/batch-analyze", api_key=None), None)["statusCode"] == 401
+        assert not (engines.single.called or engines.batch.called)
+
+        with patch.object(lambda_handler, "_EXPECTED_API_KEY", b""):
+            assert handler(_event(SINGLE_BODY), None)["statusCode"] == 500, "Unset API key should fail closed"
+            assert handler({"rawPath": "/ping"}, None)["statusCode"] == 200
+
+    print("✅ /ping and auth: PASSED")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Lambda Handler Routing Test")
+    print("=" * 60)
+
+    try:
+        test_body_routes()
+        test_path_route_beats_body()
+        test_stage_prefixed_paths()
+        test_unknown_route_404()
+        test_bad_requests_400()
+        test_ping_and_auth()
+
+        print("\n" + "=" * 60)
+        print("✅ ALL TESTS PASSED")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ TEST FAILED: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n❌ ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -68,4 +68,26 @@ resource "aws_iam_policy" "cloudwatch_metrics" {
 resource "aws_iam_role_policy_attachment" "cloudwatch_metrics_attachment" {
     role = aws_iam_role.lambda_role.name
     policy_arn = aws_iam_policy.cloudwatch_metrics.arn
+}
+
+resource "aws_iam_policy" "response_cache" {
+    name = "${var.function_name}-response-cache"
+    policy = jsonencode({
+        Version = "2012-10-17"
+        Statement = [
+            {
+                Action = [
+                    "dynamodb:GetItem",
+                    "dynamodb:PutItem"
+                ]
+                Effect = "Allow"
+                Resource = aws_dynamodb_table.response_cache.arn
+            }
+        ]
+    })
+}
+
+resource "aws_iam_role_policy_attachment" "response_cache_attachment" {
+    role = aws_iam_role.lambda_role.name
+    policy_arn = aws_iam_policy.response_cache.arn
 }
\ No newline at end of file
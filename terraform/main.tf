@@ -17,6 +17,7 @@
       variables = {
         S3_BUCKET_NAME = var.s3_bucket_name
         API_KEY = var.api_key
+        RESPONSE_CACHE_TABLE = aws_dynamodb_table.response_cache.name
       }
     }
     filename = "${path.module}/../lambda-package.zip"
@@ -28,6 +29,24 @@
     #redeploys the lambda function if the zip hash changes
     source_code_hash = filebase64sha256("${path.module}/../lambda-package.zip")
     reserved_concurrent_executions = var.reserved_concurrent_executions
+    # Native structured logs: the runtime formats each logging record as JSON (with
+    # request id) and sets the root level from application_log_level
+    logging_config {
+      log_format = "JSON"
+      application_log_level = "INFO"
+      system_log_level = "WARN"
+    }
+    # SnapStart only applies to published versions, so API Gateway invokes the alias below
+    publish = true
+    snap_start {
+      apply_on = "PublishedVersions"
+    }
+  }
+
+  resource "aws_lambda_alias" "live" {
+    name = "live"
+    function_name = aws_lambda_function.db_impact_agent.function_name
+    function_version = aws_lambda_function.db_impact_agent.version
   }
 
 
@@ -39,7 +58,7 @@
   resource "aws_apigatewayv2_integration" "lambda_integration" {
     api_id = aws_apigatewayv2_api.lambda_api.id
     integration_type="AWS_PROXY"
-    integration_uri = aws_lambda_function.db_impact_agent.invoke_arn
+    integration_uri = aws_lambda_alias.live.invoke_arn
 
   }
 
@@ -77,10 +96,46 @@
   resource "aws_lambda_permission" "api_gateway_permission" {
     action = "lambda:InvokeFunction"
     function_name = aws_lambda_function.db_impact_agent.function_name
+    qualifier = aws_lambda_alias.live.name
     principal = "apigateway.amazonaws.com"
     source_arn = "${aws_apigatewayv2_api.lambda_api.execution_arn}/*/*" 
   }
 
+  # Keep-warm ping; the handler answers /ping before auth without running a simulation
+  resource "aws_cloudwatch_event_rule" "keep_warm" {
+    name = "${var.function_name}-keep-warm"
+    schedule_expression = "rate(5 minutes)"
+  }
+
+  resource "aws_cloudwatch_event_target" "keep_warm" {
+    rule = aws_cloudwatch_event_rule.keep_warm.name
+    arn = aws_lambda_alias.live.arn
+    input = jsonencode({ rawPath = "/ping" })
+  }
+
+  resource "aws_lambda_permission" "keep_warm_permission" {
+    action = "lambda:InvokeFunction"
+    function_name = aws_lambda_function.db_impact_agent.function_name
+    qualifier = aws_lambda_alias.live.name
+    principal = "events.amazonaws.com"
+    source_arn = aws_cloudwatch_event_rule.keep_warm.arn
+  }
+
+  # Analyses shared across Lambda containers, keyed by prompt digest
+  resource "aws_dynamodb_table" "response_cache" {
+    name = "${var.function_name}-response-cache"
+    billing_mode = "PAY_PER_REQUEST"
+    hash_key = "pk"
+    attribute {
+      name = "pk"
+      type = "S"
+    }
+    ttl {
+      attribute_name = "ttl"
+      enabled = true
+    }
+  }
+
   resource "aws_s3_bucket" "db_impact_agent_bucket" {
     bucket = var.s3_bucket_name
     force_destroy = true 